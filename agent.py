@@ -6,12 +6,33 @@ It can be run with `adk web` command.
 """
 
 import os
+from functools import cached_property
 from dotenv import load_dotenv
 
 load_dotenv()
 
 from google.adk import Agent
-from agents.dsa_tools import explain_dsa_concept, analyze_complexity, get_leetcode_hints
+from google.adk.models import Gemini
+from google.genai import Client, types
+from agents.dsa_tools import explain_dsa_concept, analyze_complexity, get_leetcode_hints, find_similar_problems
+from agents.transport import shared_transport
+from agents.tool_layer import async_tool
+
+
+class PooledGemini(Gemini):
+    """Gemini model that sends requests through the shared pooled HTTP transport."""
+
+    @cached_property
+    def api_client(self) -> Client:
+        return Client(
+            http_options=types.HttpOptions(
+                headers=self._tracking_headers(),
+                retry_options=self.retry_options,
+                timeout=int(shared_transport.timeout.read * 1000),
+                httpx_client=shared_transport.sync_client,
+                httpx_async_client=shared_transport.async_client,
+            )
+        )
 
 # System instruction for the DSA Tutor
 DSA_TUTOR_INSTRUCTION = """
@@ -64,7 +85,7 @@ STEP 7: COMPLEXITY ANALYSIS
 - Use the analyze_complexity tool to explain time and space complexity.
 
 STEP 8: LEARNING REINFORCEMENT
-- Suggest 1-2 similar LeetCode problems to practice.
+- Use the find_similar_problems tool to suggest 1-2 similar LeetCode problems (never invent problem names).
 - Encourage the student.
 
 STRICT RULES:
@@ -80,12 +101,14 @@ You are a TUTOR, not a code generator.
 # Create the ADK Agent
 root_agent = Agent(
     name="dsa_tutor",
-    model="gemini-2.0-flash",
+    model=PooledGemini(model="gemini-2.0-flash"),
     description="A Student-Focused DSA & Python Tutor that teaches Data Structures and Algorithms",
     instruction=DSA_TUTOR_INSTRUCTION,
+    # Async + memoized so several tool calls in one turn run concurrently
     tools=[
-        explain_dsa_concept,
-        analyze_complexity,
-        get_leetcode_hints,
+        async_tool(explain_dsa_concept),
+        async_tool(analyze_complexity),
+        async_tool(get_leetcode_hints),
+        async_tool(find_similar_problems),
     ],
 )
@@ -6,7 +6,9 @@ from Flask routes instead of using `adk web`.
 """
 
 import os
+import atexit
 import asyncio
+import threading
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -21,6 +23,9 @@ from google.adk.sessions import InMemorySessionService
 from google.genai import types
 
 from agent import root_agent
+from agents.deadline import RequestCancelled, deadline_stats
+from agents.profiling import profiled
+from agents.transport import shared_transport
 
 # Create session service for conversation memory
 session_service = InMemorySessionService()
@@ -35,6 +40,22 @@ runner = Runner(
 # Track created sessions
 _created_sessions = set()
 
+# One long-lived event loop for every ADK call. The pooled async HTTP client
+# (agents/transport.py) keeps its connections bound to this loop, so they are
+# reused across requests instead of being torn down by a fresh asyncio.run().
+_loop = asyncio.new_event_loop()
+_loop_thread = threading.Thread(target=_loop.run_forever, name="adk-runner-loop", daemon=True)
+_loop_thread.start()
+
+
+@atexit.register
+def _close_transport():
+    # The async client's connections belong to the runner loop, so close them there
+    try:
+        asyncio.run_coroutine_threadsafe(shared_transport.aclose(), _loop).result(timeout=5)
+    except Exception as e:
+        print(f"[WARNING] Could not close the async HTTP client: {e}")
+
 
 async def _ensure_session_exists(user_id: str, session_id: str):
     """Ensure a session exists, creating it if necessary."""
@@ -63,7 +84,19 @@ async def _ensure_session_exists(user_id: str, session_id: str):
         print(f"[DEBUG] Created session: {session_id}")
 
 
-async def _run_agent_async(user_message: str, session_id: str = "default_session") -> str:
+def _add_usage(meta: dict, event):
+    """Fold one event's token usage into ``meta`` (a turn may make several model calls)."""
+    usage = getattr(event, "usage_metadata", None)
+    if meta is None or usage is None or getattr(event, "partial", False):
+        return
+    meta["prompt_tokens"] = meta.get("prompt_tokens", 0) + (usage.prompt_token_count or 0)
+    meta["completion_tokens"] = meta.get("completion_tokens", 0) + (usage.candidates_token_count or 0)
+    meta["total_tokens"] = meta.get("total_tokens", 0) + (usage.total_token_count or 0)
+    if getattr(event, "model_version", None):
+        meta["model"] = event.model_version
+
+
+async def _run_agent_async(user_message: str, session_id: str = "default_session", meta: dict = None) -> str:
     """
     Run the ADK agent asynchronously and return the response.
     """
@@ -86,6 +119,7 @@ async def _run_agent_async(user_message: str, session_id: str = "default_session
             session_id=session_id,
             new_message=content
         ):
+            _add_usage(meta, event)
             # Extract text from agent response events
             if hasattr(event, 'content') and event.content:
                 for part in event.content.parts:
@@ -104,34 +138,39 @@ async def _run_agent_async(user_message: str, session_id: str = "default_session
         raise
 
 
-def run_adk_agent(user_message: str, session_id: str = "default_session") -> str:
+# The agent runs on the loop thread, so a profiled request samples that thread too
+@profiled("adk.run", thread=lambda: (_loop_thread.ident, "adk-runner-loop"))
+def run_adk_agent(user_message: str, session_id: str = "default_session", deadline=None, meta: dict = None) -> str:
     """
     Synchronous wrapper to run the ADK agent from Flask.
     
     Args:
         user_message: The user's question or problem
         session_id: Session ID for conversation continuity
+        deadline: Optional agents.deadline.Deadline; when it passes or is
+            cancelled the agent task is cancelled, aborting any upstream stream
+        meta: Optional dict filled with the token usage of the model calls (and
+            the ``model`` version reported), as in DSATutorAgent.complete
     
     Returns:
         The agent's response as a string
+
+    Raises:
+        RequestCancelled: If the deadline passed or the request was cancelled.
     """
+    future = asyncio.run_coroutine_threadsafe(_run_agent_async(user_message, session_id, meta), _loop)
     try:
-        # Get or create event loop
-        try:
-            loop = asyncio.get_event_loop()
-            if loop.is_running():
-                # If loop is already running, use thread
-                import concurrent.futures
-                with concurrent.futures.ThreadPoolExecutor() as executor:
-                    future = executor.submit(asyncio.run, _run_agent_async(user_message, session_id))
-                    return future.result(timeout=120)
-            else:
-                return loop.run_until_complete(_run_agent_async(user_message, session_id))
-        except RuntimeError:
-            # No event loop exists, create one
-            return asyncio.run(_run_agent_async(user_message, session_id))
-            
+        if deadline is None:
+            return future.result(timeout=120)
+        return deadline.wait(future)
+
+    except RequestCancelled as e:
+        # Cancelling the future cancels the task on the runner loop
+        deadline_stats.record(e.reason, stream_aborted=True)
+        print(f"[DEBUG] ADK run cancelled: {e.reason}")
+        raise
     except Exception as e:
+        future.cancel()
         print(f"[ERROR] run_adk_agent error: {e}")
         return f"❌ Error calling AI agent: {str(e)}"
 
@@ -0,0 +1,180 @@
+"""
+Request Deadlines and Cooperative Cancellation
+
+Each /chat request gets one Deadline that covers everything it does: context
+building, waiting on a prefetch, retries and generation. Long-running work
+calls ``deadline.check()`` at safe points (between retries, between streamed
+chunks) and stops early when the deadline passes or the request is cancelled
+because the student closed the tab or re-sent their message.
+
+Configured through environment variables:
+- REQUEST_DEADLINE_SECONDS   end-to-end budget for one request (default 90)
+"""
+
+import os
+import time
+import threading
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+
+class RequestCancelled(Exception):
+    """Raised inside a request whose deadline passed or whose client went away."""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class Deadline:
+    """A point in time after which work for a request is abandoned."""
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+        self.reason = None
+        self._cancelled = threading.Event()
+
+    def remaining(self) -> float:
+        """Seconds left before the deadline (never negative)."""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set() or self.remaining() <= 0
+
+    def cancel(self, reason: str = "client disconnected"):
+        """Ask the work tied to this deadline to stop at its next check."""
+        if not self._cancelled.is_set():
+            self.reason = reason
+            self._cancelled.set()
+
+    def check(self):
+        """Raise RequestCancelled if the request should stop now."""
+        if self._cancelled.is_set():
+            raise RequestCancelled(self.reason)
+        if self.remaining() <= 0:
+            self.reason = "deadline exceeded"
+            raise RequestCancelled(self.reason)
+
+    def timeout(self, cap: float = None) -> float:
+        """Remaining time, optionally capped, for use as an upstream call timeout."""
+        self.check()
+        remaining = self.remaining()
+        return min(remaining, cap) if cap else remaining
+
+    def sleep(self, seconds: float):
+        """Back off between retries, waking early on cancellation."""
+        self._cancelled.wait(min(seconds, self.remaining()))
+        self.check()
+
+    def wait(self, future, poll: float = 0.1, cancel_on_exit: bool = True, timeout: float = None):
+        """
+        Wait for a concurrent future, honouring cancellation while waiting.
+
+        Args:
+            future: concurrent.futures.Future to wait on
+            poll: How often to re-check for cancellation (seconds)
+            cancel_on_exit: Cancel the future if the request is cancelled
+            timeout: Stop waiting after this many seconds, even if the deadline allows more
+
+        Raises:
+            RequestCancelled: If the deadline passed or the request was cancelled first.
+            concurrent.futures.TimeoutError: If ``timeout`` elapsed first (the future is left running).
+        """
+        give_up = None if timeout is None else time.monotonic() + timeout
+        while True:
+            left = self.remaining()
+            if give_up is not None and not self._cancelled.is_set():
+                if time.monotonic() >= give_up:
+                    raise FutureTimeoutError()
+                left = min(left, give_up - time.monotonic())
+            try:
+                self.check()
+            except RequestCancelled:
+                if cancel_on_exit:
+                    future.cancel()
+                raise
+            try:
+                return future.result(timeout=min(poll, max(left, 0.001)))
+            except FutureTimeoutError:
+                continue
+
+
+class DeadlineStats:
+    """Counters for cancelled work and the output token budget it left unused."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {
+            "deadline_exceeded": 0,
+            "client_cancelled": 0,
+            "superseded": 0,
+            "streams_aborted": 0,
+            "unused_token_budget": 0,
+            "tokens_discarded": 0,
+        }
+
+    def record(self, reason: str, unused_budget: int = 0, tokens_discarded: int = 0, stream_aborted: bool = False):
+        """
+        Record one cancelled unit of work.
+
+        Args:
+            reason: RequestCancelled reason
+            unused_budget: max_tokens minus what was generated. An upper bound on the tokens
+                saved, since the model may have stopped earlier on its own
+            tokens_discarded: Tokens already generated that nobody will read
+            stream_aborted: Whether an in-progress upstream stream was closed
+        """
+        if reason == "deadline exceeded":
+            key = "deadline_exceeded"
+        elif reason == "superseded":
+            key = "superseded"
+        else:
+            key = "client_cancelled"
+        with self._lock:
+            self._stats[key] += 1
+            self._stats["unused_token_budget"] += max(0, unused_budget)
+            self._stats["tokens_discarded"] += max(0, tokens_discarded)
+            if stream_aborted:
+                self._stats["streams_aborted"] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(self._stats)
+
+
+class DeadlineRegistry:
+    """Tracks the in-flight request of each session so it can be cancelled."""
+
+    def __init__(self, default_seconds: float = 90.0):
+        self.default_seconds = default_seconds
+        self._active = {}  # session id -> Deadline
+        self._lock = threading.Lock()
+
+    def start(self, sid: str, seconds: float = None) -> Deadline:
+        """Begin a request; a previous in-flight request of the same session is superseded."""
+        deadline = Deadline(seconds or self.default_seconds)
+        with self._lock:
+            previous = self._active.get(sid)
+            self._active[sid] = deadline
+        if previous:
+            previous.cancel("superseded")
+        return deadline
+
+    def finish(self, sid: str, deadline: Deadline):
+        with self._lock:
+            if self._active.get(sid) is deadline:
+                del self._active[sid]
+
+    def cancel(self, sid: str, reason: str = "client disconnected") -> bool:
+        """Cancel the session's in-flight request, if any."""
+        with self._lock:
+            deadline = self._active.pop(sid, None)
+        if deadline:
+            deadline.cancel(reason)
+        return deadline is not None
+
+
+# Shared instances
+deadline_stats = DeadlineStats()
+deadline_registry = DeadlineRegistry(float(os.getenv("REQUEST_DEADLINE_SECONDS", "90")))
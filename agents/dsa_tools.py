@@ -3,6 +3,46 @@ DSA Tools for Google ADK Agent.
 Custom tools that the DSA Tutor agent can use.
 """
 
+from agents.similar_problems import problem_index
+
+CONCEPTS = {
+    "array": "An array is a collection of elements stored at contiguous memory locations. Think of it like a row of lockers - each locker has a number (index) and can store one item.",
+    "linked list": "A linked list is a chain of nodes where each node contains data and a pointer to the next node. Like a treasure hunt where each clue points to the next location.",
+    "stack": "A stack follows LIFO (Last In, First Out). Like a stack of plates - you add and remove from the top only.",
+    "queue": "A queue follows FIFO (First In, First Out). Like a line at a store - first person in line is served first.",
+    "hash table": "A hash table uses a hash function to map keys to values for fast lookups. Like a library catalog that tells you exactly where to find a book.",
+    "binary search": "Binary search works on sorted data by repeatedly dividing the search space in half. Like guessing a number between 1-100 by always guessing the middle.",
+    "recursion": "Recursion is when a function calls itself to solve smaller subproblems. Like Russian nesting dolls - each doll contains a smaller version of itself.",
+    "dynamic programming": "DP solves complex problems by breaking them into overlapping subproblems and storing results to avoid redundant work. Like filling a table of solutions bottom-up.",
+    "binary tree": "A binary tree is a hierarchical structure where each node has at most two children (left and right). Like a family tree but each person has at most 2 children.",
+    "graph": "A graph consists of vertices (nodes) connected by edges. Like a social network where people are vertices and friendships are edges.",
+    "two pointers": "Two pointers technique uses two indices to traverse data, often from opposite ends. Like two people walking towards each other on a path.",
+    "sliding window": "Sliding window maintains a window of elements that slides through the array. Like looking through a moving frame at a painting.",
+}
+
+HINTS = {
+    "two sum": [
+        "Hint 1: Think about what information you need to find a pair that sums to target.",
+        "Hint 2: For each number, you need to find if its complement (target - num) exists. How can you check this quickly?",
+        "Hint 3: Use a hash map to store numbers you've seen and their indices. For each new number, check if (target - num) is in the map."
+    ],
+    "valid parentheses": [
+        "Hint 1: What data structure follows Last-In-First-Out (LIFO) order?",
+        "Hint 2: Push opening brackets onto a stack. When you see a closing bracket, check if it matches the top of the stack.",
+        "Hint 3: Use a dictionary to map closing brackets to opening brackets. Pop from stack and verify match."
+    ],
+    "reverse linked list": [
+        "Hint 1: You need to change the direction of all the arrows (next pointers).",
+        "Hint 2: Keep track of three nodes: previous, current, and next.",
+        "Hint 3: Save next, point current to previous, then move forward. prev=curr, curr=next."
+    ],
+    "binary search": [
+        "Hint 1: Always work with a sorted array. Compare middle element with target.",
+        "Hint 2: If target < mid, search left half. If target > mid, search right half.",
+        "Hint 3: Use left and right pointers. mid = (left + right) // 2. Update boundaries based on comparison."
+    ],
+}
+
 
 def explain_dsa_concept(concept: str) -> str:
     """
@@ -14,24 +54,10 @@ def explain_dsa_concept(concept: str) -> str:
     Returns:
         A detailed explanation of the concept suitable for beginners.
     """
-    concepts = {
-        "array": "An array is a collection of elements stored at contiguous memory locations. Think of it like a row of lockers - each locker has a number (index) and can store one item.",
-        "linked list": "A linked list is a chain of nodes where each node contains data and a pointer to the next node. Like a treasure hunt where each clue points to the next location.",
-        "stack": "A stack follows LIFO (Last In, First Out). Like a stack of plates - you add and remove from the top only.",
-        "queue": "A queue follows FIFO (First In, First Out). Like a line at a store - first person in line is served first.",
-        "hash table": "A hash table uses a hash function to map keys to values for fast lookups. Like a library catalog that tells you exactly where to find a book.",
-        "binary search": "Binary search works on sorted data by repeatedly dividing the search space in half. Like guessing a number between 1-100 by always guessing the middle.",
-        "recursion": "Recursion is when a function calls itself to solve smaller subproblems. Like Russian nesting dolls - each doll contains a smaller version of itself.",
-        "dynamic programming": "DP solves complex problems by breaking them into overlapping subproblems and storing results to avoid redundant work. Like filling a table of solutions bottom-up.",
-        "binary tree": "A binary tree is a hierarchical structure where each node has at most two children (left and right). Like a family tree but each person has at most 2 children.",
-        "graph": "A graph consists of vertices (nodes) connected by edges. Like a social network where people are vertices and friendships are edges.",
-        "two pointers": "Two pointers technique uses two indices to traverse data, often from opposite ends. Like two people walking towards each other on a path.",
-        "sliding window": "Sliding window maintains a window of elements that slides through the array. Like looking through a moving frame at a painting.",
-    }
     
     concept_lower = concept.lower().strip()
     
-    for key, explanation in concepts.items():
+    for key, explanation in CONCEPTS.items():
         if key in concept_lower or concept_lower in key:
             return f"## {concept.title()}\n\n{explanation}\n\n### Key Points:\n- Commonly used in coding interviews\n- Practice with LeetCode problems to master it"
     
@@ -79,33 +105,11 @@ def get_leetcode_hints(problem_name: str, hint_level: int = 1) -> str:
     Returns:
         A hint appropriate for the specified level.
     """
-    hints = {
-        "two sum": [
-            "Hint 1: Think about what information you need to find a pair that sums to target.",
-            "Hint 2: For each number, you need to find if its complement (target - num) exists. How can you check this quickly?",
-            "Hint 3: Use a hash map to store numbers you've seen and their indices. For each new number, check if (target - num) is in the map."
-        ],
-        "valid parentheses": [
-            "Hint 1: What data structure follows Last-In-First-Out (LIFO) order?",
-            "Hint 2: Push opening brackets onto a stack. When you see a closing bracket, check if it matches the top of the stack.",
-            "Hint 3: Use a dictionary to map closing brackets to opening brackets. Pop from stack and verify match."
-        ],
-        "reverse linked list": [
-            "Hint 1: You need to change the direction of all the arrows (next pointers).",
-            "Hint 2: Keep track of three nodes: previous, current, and next.",
-            "Hint 3: Save next, point current to previous, then move forward. prev=curr, curr=next."
-        ],
-        "binary search": [
-            "Hint 1: Always work with a sorted array. Compare middle element with target.",
-            "Hint 2: If target < mid, search left half. If target > mid, search right half.",
-            "Hint 3: Use left and right pointers. mid = (left + right) // 2. Update boundaries based on comparison."
-        ],
-    }
     
     problem_lower = problem_name.lower().strip()
     hint_level = max(1, min(3, hint_level))  # Clamp between 1-3
     
-    for key, problem_hints in hints.items():
+    for key, problem_hints in HINTS.items():
         if key in problem_lower or problem_lower in key:
             return problem_hints[hint_level - 1]
     
@@ -116,3 +120,57 @@ def get_leetcode_hints(problem_name: str, hint_level: int = 1) -> str:
     ]
     
     return generic_hints[hint_level - 1]
+
+
+def find_similar_problems(problem: str, count: int = 2) -> str:
+    """
+    Find LeetCode problems similar to the given one, from the local problem catalog.
+
+    Args:
+        problem: Problem name or a short description of the task
+        count: Number of problems to suggest (1-5)
+
+    Returns:
+        A markdown list of similar problems with links, or a note if none are known.
+    """
+    section = problem_index.practice_section(problem, max(1, min(5, count)))
+    return section.strip() or "No similar problems found in the catalog."
+
+
+def detect_concept(text: str):
+    """Return the most specific known DSA concept mentioned in the text, or None."""
+    text_lower = text.lower()
+    matches = [key for key in CONCEPTS if key in text_lower]
+    return max(matches, key=len) if matches else None
+
+
+def _names_problem(text_lower: str, name: str) -> bool:
+    """
+    Whether the text names the problem called ``name``.
+
+    A problem named after a technique ("Binary Search") only counts when it is
+    asked about as a problem, not when the technique comes up ("I'm stuck on the
+    binary search part", "binary search trees").
+    """
+    if name not in text_lower:
+        return False
+    if name not in CONCEPTS:
+        return True
+    return text_lower.strip(" ?.!") == name or f"{name} problem" in text_lower
+
+
+def detect_problem(text: str):
+    """Return the known LeetCode problem mentioned in the text, or None."""
+    text_lower = text.lower().replace("-", " ")
+    for key in HINTS:
+        if _names_problem(text_lower, key):
+            return key
+    skipped = set()
+    while True:
+        problem = problem_index.match(text, exclude=skipped)
+        if problem is None:
+            return None
+        title = problem["title"].lower()
+        if title not in CONCEPTS or _names_problem(text_lower, title):
+            return title
+        skipped.add(problem["id"])
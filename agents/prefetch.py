@@ -0,0 +1,205 @@
+"""
+Speculative Prefetcher for the DSA Tutor
+
+While the student is reading a response, the most likely follow-up (usually the
+next rung of the hint ladder) is generated in the background and kept for a
+short time. If the student asks for it, the stored answer is served instantly
+instead of paying a full LLM round trip.
+
+Prefetching runs under a budget so it can never starve real requests:
+- at most PREFETCH_MAX_INFLIGHT background generations at once
+- no new prefetches while PREFETCH_MAX_FOREGROUND live requests are running
+- results expire after PREFETCH_TTL_SECONDS
+- a request waits at most PREFETCH_WAIT_SECONDS for a job still running, then
+  generates the answer itself
+- each job gets its own deadline of PREFETCH_JOB_SECONDS (see ``job_deadline``),
+  so a stuck generation gives its budget slot back
+"""
+
+import os
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from contextlib import contextmanager
+
+from agents.deadline import Deadline, RequestCancelled
+
+
+class Prefetcher:
+    """Budgeted background executor with a short-lived result store."""
+
+    def __init__(self, max_inflight: int = 2, max_foreground: int = 4, ttl_seconds: float = 120.0,
+                 max_entries: int = 256, wait_seconds: float = 10.0, job_seconds: float = 30.0,
+                 enabled: bool = True):
+        self.max_inflight = max(1, max_inflight)
+        self.max_foreground = max(1, max_foreground)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.wait_seconds = wait_seconds
+        self.job_seconds = job_seconds
+        self.enabled = enabled
+
+        self._executor = ThreadPoolExecutor(max_workers=self.max_inflight, thread_name_prefix="prefetch")
+        self._budget = threading.BoundedSemaphore(self.max_inflight)
+        self._entries = OrderedDict()  # key -> (created_at, future)
+        self._lock = threading.Lock()
+        self._foreground = 0
+        self._stats = {
+            "scheduled": 0,
+            "skipped_budget": 0,
+            "skipped_busy": 0,
+            "hits": 0,
+            "misses": 0,
+            "expired": 0,
+            "failed": 0,
+        }
+
+    @contextmanager
+    def foreground(self):
+        """Mark a live request as running so prefetching backs off under load."""
+        with self._lock:
+            self._foreground += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._foreground -= 1
+
+    def schedule(self, key, fn, *args, **kwargs) -> bool:
+        """
+        Generate a likely-needed result in the background.
+
+        Args:
+            key: Hashable key the result will be served under (session id first)
+            fn: Callable producing the result; exceptions mean "nothing to serve"
+
+        Returns:
+            True if the job was started, False if skipped (disabled, cached or over budget).
+        """
+        if not self.enabled:
+            return False
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and not self._is_expired(entry):
+                return False
+            if self._foreground >= self.max_foreground:
+                self._stats["skipped_busy"] += 1
+                return False
+
+        if not self._budget.acquire(blocking=False):
+            with self._lock:
+                self._stats["skipped_budget"] += 1
+            return False
+
+        future = self._executor.submit(fn, *args, **kwargs)
+        # Release on completion *or* cancellation, so a dropped job frees its slot
+        future.add_done_callback(lambda _: self._budget.release())
+        with self._lock:
+            self._entries[key] = (time.monotonic(), future)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                _, (_, old_future) = self._entries.popitem(last=False)
+                old_future.cancel()
+            self._stats["scheduled"] += 1
+        print(f"[DEBUG] Prefetch scheduled: {key}")
+        return True
+
+    def idle(self, own: int = 0) -> bool:
+        """Whether no live requests are running besides ``own`` (e.g. 1 for the caller's)."""
+        with self._lock:
+            return self._foreground <= own
+
+    def job_deadline(self) -> Deadline:
+        """Deadline for one background job; pass it to the job's upstream call."""
+        return Deadline(self.job_seconds)
+
+    def get(self, key, deadline=None):
+        """
+        Take a prefetched result, waiting briefly if it is still being generated.
+
+        Args:
+            key: Key the result was scheduled under
+            deadline: Optional request deadline; the wait is also capped at wait_seconds
+
+        Returns:
+            The result, or None if nothing usable was prefetched.
+
+        Raises:
+            RequestCancelled: If the request was cancelled while waiting.
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+        if entry is None:
+            self._count("misses")
+            return None
+
+        if self._is_expired(entry):
+            entry[1].cancel()
+            self._count("expired")
+            return None
+
+        try:
+            # An in-flight prefetch started earlier will finish before a fresh call would
+            if deadline is None:
+                result = entry[1].result(timeout=self.wait_seconds)
+            else:
+                # Leave the job running on cancellation; a later request may still use it.
+                # A job that is too slow counts as a miss, leaving time for a fresh answer.
+                result = deadline.wait(entry[1], cancel_on_exit=False,
+                                       timeout=min(self.wait_seconds, deadline.remaining()))
+        except RequestCancelled as e:
+            if deadline is None or not deadline.cancelled:
+                # The job ran out of its own deadline, not the request
+                print(f"[DEBUG] Prefetch for {key} gave up: {e.reason}")
+                self._count("failed")
+                return None
+            with self._lock:
+                self._entries[key] = entry
+            raise
+        except FutureTimeoutError:
+            self._count("misses")
+            return None
+        except Exception as e:
+            print(f"[DEBUG] Prefetch for {key} failed: {e}")
+            self._count("failed")
+            return None
+
+        self._count("hits")
+        print(f"[DEBUG] Prefetch hit: {key}")
+        return result
+
+    def invalidate(self, prefix):
+        """Drop every entry whose key starts with the given session id."""
+        with self._lock:
+            stale = [k for k in self._entries if isinstance(k, tuple) and k and k[0] == prefix]
+            for k in stale:
+                self._entries.pop(k)[1].cancel()
+
+    def stats(self) -> dict:
+        """Counters plus current occupancy, for the /status endpoint."""
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot["entries"] = len(self._entries)
+            snapshot["foreground"] = self._foreground
+        snapshot["enabled"] = self.enabled
+        return snapshot
+
+    def _is_expired(self, entry) -> bool:
+        return time.monotonic() - entry[0] > self.ttl_seconds
+
+    def _count(self, name: str):
+        with self._lock:
+            self._stats[name] += 1
+
+
+# Shared prefetcher instance
+prefetcher = Prefetcher(
+    max_inflight=int(os.getenv("PREFETCH_MAX_INFLIGHT", "2")),
+    max_foreground=int(os.getenv("PREFETCH_MAX_FOREGROUND", "4")),
+    ttl_seconds=float(os.getenv("PREFETCH_TTL_SECONDS", "120")),
+    wait_seconds=float(os.getenv("PREFETCH_WAIT_SECONDS", "10")),
+    job_seconds=float(os.getenv("PREFETCH_JOB_SECONDS", "30")),
+    enabled=os.getenv("PREFETCH_ENABLED", "1") not in ("0", "false", "False"),
+)
@@ -0,0 +1,250 @@
+"""
+On-Demand Request Profiling
+
+Opt-in profiling for slow requests. A request is profiled when an admin sends
+``X-Profile: 1`` or when it is picked by the sampling rate. While it runs, a
+background sampler records the stacks of the request thread (and of the ADK
+runner loop while the agent is running for it) and section timings are
+collected from ``profiled`` functions. The result is written as a collapsed
+stack file (``*.folded``, for flamegraph.pl / speedscope) plus a JSON summary.
+
+``PROFILE_MODE=cprofile`` records a deterministic cProfile of the request
+thread instead and writes a ``*.prof`` file (pstats / snakeviz). Only one
+cProfile can be active per process, so a request profiled while another one
+holds it falls back to sampling.
+
+Configured through environment variables:
+- PROFILE_DIR              where profiles are written (default profiles/)
+- PROFILE_SAMPLE_RATE      fraction of requests profiled automatically (default 0)
+- PROFILE_INTERVAL_MS      stack sampling interval (default 5)
+- PROFILE_MODE             sample | cprofile (default sample)
+- PROFILE_MAX_FILES        profiles kept on disk (default 50)
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import cProfile
+import threading
+import functools
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+
+_local = threading.local()
+
+# cProfile allows one active profiler per process (enable() raises otherwise on 3.12+)
+_cprofile_lock = threading.Lock()
+
+
+class RequestProfile:
+    """Profile of a single request: stack samples plus section timings."""
+
+    def __init__(self, label: str, interval: float, mode: str = "sample"):
+        self.id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self.label = label
+        self.interval = interval
+        self.mode = mode
+        self.sections = Counter()  # section -> total ms
+        self.samples = Counter()   # collapsed stack -> count
+        self.started = time.perf_counter()
+        self.duration_ms = 0.0
+        self._threads = {threading.get_ident(): "request"}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler = None
+        self._cprofile = None
+
+    def start(self):
+        if self.mode == "cprofile" and _cprofile_lock.acquire(blocking=False):
+            try:
+                self._cprofile = cProfile.Profile()
+                self._cprofile.enable()
+                return
+            except ValueError as e:  # another profiler (e.g. a debugger) is active
+                print(f"[WARNING] cProfile unavailable ({e}); sampling instead")
+                self._cprofile = None
+                _cprofile_lock.release()
+        self.mode = "sample"
+        self._sampler = threading.Thread(target=self._sample_loop, name="profile-sampler", daemon=True)
+        self._sampler.start()
+
+    def stop(self):
+        self.duration_ms = round((time.perf_counter() - self.started) * 1000, 1)
+        if self._cprofile:
+            self._cprofile.disable()
+            _cprofile_lock.release()
+        if self._sampler:
+            self._stop.set()
+            self._sampler.join()
+
+    def watch_thread(self, ident: int, name: str):
+        """Also sample another thread (e.g. the ADK loop) while it works for this request."""
+        with self._lock:
+            self._threads[ident] = name
+
+    def unwatch_thread(self, ident: int):
+        with self._lock:
+            if ident != threading.get_ident():
+                self._threads.pop(ident, None)
+
+    def _sample_loop(self):
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            with self._lock:
+                threads = list(self._threads.items())
+            for ident, name in threads:
+                frame = frames.get(ident)
+                if frame is not None:
+                    self.samples[_collapse(frame, name)] += 1
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "label": self.label,
+            "mode": self.mode,
+            "duration_ms": self.duration_ms,
+            "samples": sum(self.samples.values()),
+            "interval_ms": round(self.interval * 1000, 2),
+            "sections_ms": {k: round(v, 1) for k, v in self.sections.most_common()},
+            "created": time.time(),
+        }
+
+
+def _collapse(frame, thread_name: str) -> str:
+    """Turn a frame chain into a root-first, semicolon-separated stack."""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)})".replace(";", ":"))
+        frame = frame.f_back
+    names.append(thread_name)
+    return ";".join(reversed(names))
+
+
+class Profiler:
+    """Decides which requests to profile and stores the results."""
+
+    def __init__(self, directory, sample_rate: float = 0.0, interval_ms: float = 5.0,
+                 mode: str = "sample", max_files: int = 50):
+        self.directory = Path(directory)
+        self.sample_rate = sample_rate
+        self.interval = interval_ms / 1000.0
+        self.mode = mode if mode in ("sample", "cprofile") else "sample"
+        self.max_files = max_files
+
+    def should_profile(self, forced: bool = False) -> bool:
+        return forced or (self.sample_rate > 0 and random.random() < self.sample_rate)
+
+    def start(self, label: str) -> RequestProfile:
+        """Start profiling the current thread's request."""
+        profile = RequestProfile(label, self.interval, self.mode)
+        _local.profile = profile
+        profile.start()
+        return profile
+
+    def finish(self, profile: RequestProfile) -> dict:
+        """Stop a profile, write it to disk and return its summary."""
+        profile.stop()
+        _local.profile = None
+        summary = profile.summary()
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            if profile.mode == "cprofile":
+                profile._cprofile.dump_stats(str(self.directory / f"{profile.id}.prof"))
+                summary["file"] = f"{profile.id}.prof"
+            elif profile.samples:
+                lines = [f"{stack} {count}" for stack, count in profile.samples.most_common()]
+                (self.directory / f"{profile.id}.folded").write_text("\n".join(lines) + "\n", encoding="utf-8")
+                summary["file"] = f"{profile.id}.folded"
+            else:
+                # Finished within one sampling interval: only the timings are worth keeping
+                summary["file"] = None
+            (self.directory / f"{profile.id}.json").write_text(json.dumps(summary), encoding="utf-8")
+            self._prune()
+            print(f"[DEBUG] Profile saved: {summary['file'] or profile.id + '.json'} ({summary['duration_ms']} ms)")
+        except OSError as e:
+            print(f"[ERROR] Could not save profile {profile.id}: {e}")
+        return summary
+
+    def recent(self, limit: int = 20) -> list:
+        """Summaries of the newest saved profiles."""
+        if not self.directory.exists():
+            return []
+        files = sorted(self.directory.glob("*.json"), key=lambda p: p.stat().st_mtime, reverse=True)
+        result = []
+        for path in files[:limit]:
+            try:
+                result.append(json.loads(path.read_text(encoding="utf-8")))
+            except (OSError, ValueError):
+                continue
+        return result
+
+    def _prune(self):
+        summaries = sorted(self.directory.glob("*.json"), key=lambda p: p.stat().st_mtime, reverse=True)
+        for path in summaries[self.max_files:]:
+            for sibling in self.directory.glob(f"{path.stem}.*"):
+                sibling.unlink(missing_ok=True)
+
+
+def current_profile():
+    """The profile of the request running on this thread, if any."""
+    return getattr(_local, "profile", None)
+
+
+@contextmanager
+def profile_section(name: str):
+    """Time a block as a named section of the active profile (no-op otherwise)."""
+    profile = current_profile()
+    if profile is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        with profile._lock:
+            profile.sections[name] += (time.perf_counter() - start) * 1000
+
+
+def profiled(name: str, thread=None):
+    """
+    Decorator: record the function as a profile section.
+
+    Args:
+        name: Section name shown in the profile summary
+        thread: Optional callable returning ``(ident, name)`` of another thread
+            that does the work for this call, sampled while the call runs
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            profile = current_profile()
+            if profile is None:
+                return fn(*args, **kwargs)
+            extra = thread() if thread else None
+            if extra:
+                profile.watch_thread(*extra)
+            try:
+                with profile_section(name):
+                    return fn(*args, **kwargs)
+            finally:
+                if extra:
+                    profile.unwatch_thread(extra[0])
+        return wrapper
+    return decorator
+
+
+base_dir = Path(__file__).resolve().parent.parent
+
+# Shared profiler instance
+profiler = Profiler(
+    os.getenv("PROFILE_DIR", str(base_dir / "profiles")),
+    sample_rate=float(os.getenv("PROFILE_SAMPLE_RATE", "0")),
+    interval_ms=float(os.getenv("PROFILE_INTERVAL_MS", "5")),
+    mode=os.getenv("PROFILE_MODE", "sample"),
+    max_files=int(os.getenv("PROFILE_MAX_FILES", "50")),
+)
@@ -0,0 +1,241 @@
+"""
+Traffic Replay for Comparing Backends and Models
+
+Replays a capture recorded by app/capture.py against one or more backends at
+a chosen concurrency, and reports per backend:
+
+- latency distribution (p50 / p90 / p99 / max)
+- error rate
+- prompt and completion token usage
+- response length, and its difference from the first (baseline) backend
+
+Usage:
+    python -m agents.replay captures/chat.jsonl.gz \\
+        --backend groq:llama-3.1-8b-instant --backend groq:llama-3.3-70b-versatile \\
+        --backend adk --concurrency 4 --json replay.json
+
+Backends:
+- groq:<model>              the tutor prompt, sent to one Groq model only
+- adk                       the Gemini-backed ADK root_agent (needs google-adk)
+- stub[:<ms>[:<error_rate>]] in-process fake, no network (default 50 ms, 0 errors)
+
+To exercise the real Groq client path offline, point GROQ_BASE_URL at a local
+OpenAI-compatible stub server and use the groq:<model> backends.
+"""
+
+import sys
+import json
+import time
+import uuid
+import random
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+from agents.tutor_agent import tutor_agent
+from agents.deadline import Deadline
+from app.capture import load_capture
+
+
+class GroqBackend:
+    """The production tutor prompt, pinned to one Groq model."""
+
+    def __init__(self, model: str):
+        self.name = f"groq:{model}"
+        self.model = model
+
+    def run(self, record: dict, timeout: float):
+        meta = {}
+        context = record.get("context") or ""
+        if record.get("hint_level"):
+            prompt = tutor_agent.hint_prompt(record["message"], record["hint_level"], context)
+            max_tokens = 512
+        else:
+            prompt = tutor_agent.build_prompt(record["message"], context)
+            max_tokens = 2048
+        text = tutor_agent.complete(prompt, max_tokens, deadline=Deadline(timeout), meta=meta, models=[self.model])
+        return text, meta
+
+
+class AdkBackend:
+    """The ADK root_agent, with a fresh session per replayed request."""
+
+    def __init__(self, run=None):
+        if run is None:
+            # Imported lazily: google-adk is only needed when this backend is used
+            from agents.adk_runner import run_adk_agent as run
+        self.name = "adk"
+        self._run = run
+
+    def run(self, record: dict, timeout: float):
+        message = record["message"]
+        if record.get("hint_level"):
+            message = f"I'm stuck on this problem. Give me only hint {record['hint_level']} of 3:\n{message}"
+        if record.get("context"):
+            message = f"{record['context']}\n\n{message}"
+        meta = {}
+        text = self._run(message, session_id=f"replay-{uuid.uuid4().hex}", deadline=Deadline(timeout), meta=meta)
+        if text.startswith("❌ Error calling AI agent"):
+            raise RuntimeError(text)
+        return text, meta
+
+
+class StubBackend:
+    """Deterministic fake backend for offline dry runs of the harness."""
+
+    def __init__(self, latency_ms: float = 50.0, error_rate: float = 0.0, seed: int = 0):
+        self.name = f"stub:{latency_ms:g}:{error_rate:g}"
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self.seed = seed
+
+    def run(self, record: dict, timeout: float):
+        rng = random.Random(f"{self.seed}:{record['message']}:{record.get('hint_level')}")
+        time.sleep(min(timeout, self.latency_ms * (0.5 + rng.random()) / 1000))
+        if rng.random() < self.error_rate:
+            raise RuntimeError("stub error")
+        words = 60 if record.get("hint_level") else 400
+        text = " ".join(["step"] * int(words * (0.5 + rng.random())))
+        prompt_chars = len(record["message"]) + len(record.get("context") or "")
+        return text, {"prompt_tokens": prompt_chars // 4, "completion_tokens": len(text) // 4}
+
+
+def make_backend(spec: str):
+    """Create a backend from its command-line spec (see module docstring)."""
+    kind, _, rest = spec.partition(":")
+    if kind == "groq" and rest:
+        return GroqBackend(rest)
+    if kind == "adk":
+        return AdkBackend()
+    if kind == "stub":
+        parts = [float(p) for p in rest.split(":") if p]
+        return StubBackend(*parts)
+    raise ValueError(f"Unknown backend '{spec}' (expected groq:<model>, adk or stub[:ms[:error_rate]])")
+
+
+def replay(records: list, backend, concurrency: int = 4, timeout: float = 90.0) -> list:
+    """
+    Run every record against one backend, ``concurrency`` requests at a time.
+
+    Returns:
+        One result dict per record, in capture order.
+    """
+    def run_one(record):
+        start = time.perf_counter()
+        try:
+            text, meta = backend.run(record, timeout)
+            error = None
+        except Exception as e:
+            text, meta, error = "", {}, f"{type(e).__name__}: {e}"
+        return {
+            "ok": error is None,
+            "error": error,
+            "latency_ms": round((time.perf_counter() - start) * 1000, 1),
+            "chars": len(text or ""),
+            "prompt_tokens": meta.get("prompt_tokens") or 0,
+            "completion_tokens": meta.get("completion_tokens") or 0,
+        }
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="replay") as pool:
+        return list(pool.map(run_one, records))
+
+
+def _percentile(values: list, pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, int(round(pct / 100 * len(values))) - 1))]
+
+
+def summarise(results: list, baseline: list = None, wall_seconds: float = None) -> dict:
+    """
+    Aggregate one backend's results.
+
+    Args:
+        results: Output of ``replay``
+        baseline: Results of the baseline backend for the same records, if any
+        wall_seconds: Elapsed time of the whole run, for throughput
+    """
+    ok = [r for r in results if r["ok"]]
+    latencies = sorted(r["latency_ms"] for r in ok)
+    summary = {
+        "requests": len(results),
+        "errors": len(results) - len(ok),
+        "error_rate": round((len(results) - len(ok)) / len(results), 3) if results else 0.0,
+        "latency_ms": {
+            "p50": _percentile(latencies, 50),
+            "p90": _percentile(latencies, 90),
+            "p99": _percentile(latencies, 99),
+            "max": latencies[-1] if latencies else 0.0,
+            "mean": round(sum(latencies) / len(latencies), 1) if latencies else 0.0,
+        },
+        "prompt_tokens": sum(r["prompt_tokens"] for r in ok),
+        "completion_tokens": sum(r["completion_tokens"] for r in ok),
+        "avg_completion_tokens": round(sum(r["completion_tokens"] for r in ok) / len(ok), 1) if ok else 0.0,
+        "avg_chars": round(sum(r["chars"] for r in ok) / len(ok), 1) if ok else 0.0,
+        "error_samples": sorted({r["error"] for r in results if r["error"]})[:3],
+    }
+    if wall_seconds:
+        summary["throughput_rps"] = round(len(results) / wall_seconds, 2)
+    if baseline is not None:
+        pairs = [(r["chars"], b["chars"]) for r, b in zip(results, baseline) if r["ok"] and b["ok"]]
+        summary["vs_baseline"] = {
+            "compared": len(pairs),
+            "avg_char_diff": round(sum(a - b for a, b in pairs) / len(pairs), 1) if pairs else 0.0,
+            "avg_length_ratio": round(sum(a / b for a, b in pairs if b) / len(pairs), 3) if pairs else 0.0,
+        }
+    return summary
+
+
+def compare(records: list, backends: list, concurrency: int = 4, timeout: float = 90.0) -> dict:
+    """Replay the same records against each backend; the first one is the baseline."""
+    report = {}
+    baseline = None
+    for backend in backends:
+        start = time.perf_counter()
+        results = replay(records, backend, concurrency, timeout)
+        report[backend.name] = summarise(results, baseline, time.perf_counter() - start)
+        if baseline is None:
+            baseline = results
+    return report
+
+
+def format_report(report: dict) -> str:
+    """Plain-text table of a ``compare`` report."""
+    header = f"{'backend':<36} {'reqs':>5} {'err%':>6} {'p50':>8} {'p90':>8} {'p99':>8} " \
+             f"{'out tok':>8} {'chars':>8} {'Δchars':>8}"
+    lines = [header, "-" * len(header)]
+    for name, s in report.items():
+        lat = s["latency_ms"]
+        diff = s.get("vs_baseline", {}).get("avg_char_diff", 0.0)
+        lines.append(
+            f"{name:<36} {s['requests']:>5} {s['error_rate'] * 100:>5.1f}% {lat['p50']:>8.0f} {lat['p90']:>8.0f} "
+            f"{lat['p99']:>8.0f} {s['avg_completion_tokens']:>8.0f} {s['avg_chars']:>8.0f} {diff:>+8.0f}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay captured /chat traffic against backends.")
+    parser.add_argument("capture", help="capture file written by app/capture.py")
+    parser.add_argument("--backend", action="append", dest="backends",
+                        help="groq:<model>, adk or stub[:ms[:error_rate]] (repeatable; first is the baseline)")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--limit", type=int, help="replay only the first N requests")
+    parser.add_argument("--timeout", type=float, default=90.0, help="per-request deadline in seconds")
+    parser.add_argument("--json", help="also write the full report to this file")
+    args = parser.parse_args(argv)
+
+    records = load_capture(args.capture)[:args.limit]
+    backends = [make_backend(spec) for spec in args.backends or ["stub"]]
+    print(f"Replaying {len(records)} requests against {len(backends)} backend(s) at concurrency {args.concurrency}")
+
+    report = compare(records, backends, args.concurrency, args.timeout)
+    print(format_report(report))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return report
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
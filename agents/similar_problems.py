@@ -0,0 +1,299 @@
+"""
+Similar-Problem Recommendations
+
+Practice suggestions come from a local problem catalog (data/problems.json)
+instead of being invented by the model. An offline build turns the catalog
+into a similarity graph:
+
+- every problem becomes a TF-IDF vector over its title (counted twice) and description words
+  plus its tags (weighted higher, since tags carry the technique)
+- each problem's top-k neighbours by cosine similarity are stored as edges
+- a pruned inverted index (highest-weight postings per term only) serves as an
+  approximate nearest-neighbour index for free-text questions
+
+The graph is loaded once at startup. A problem named in the question is
+answered with a dict lookup; anything else takes a few postings walks, well
+under a millisecond either way. A question whose best search hit scores at
+least ``match_score`` is taken to be that problem restated, so it gets the
+problem's graph neighbours rather than the problem itself.
+
+Rebuild after editing the catalog:
+    python -m agents.similar_problems
+
+Configured through environment variables:
+- PROBLEM_CATALOG        catalog file (default data/problems.json)
+- PROBLEM_GRAPH          prebuilt graph file (default data/problem_graph.json)
+- PRACTICE_SUGGESTIONS   similar problems appended to a full answer (default 2, 0 disables)
+"""
+
+import os
+import re
+import sys
+import json
+import math
+import time
+import hashlib
+import threading
+from collections import Counter
+from pathlib import Path
+
+# Tags describe the technique and titles name the task; both outweigh description wording
+TAG_WEIGHT = 2.0
+TITLE_WEIGHT = 2
+
+# Shorthand students use for catalog tags
+TAG_ALIASES = {
+    "bfs": "breadth-first search",
+    "dfs": "depth-first search",
+    "dp": "dynamic programming",
+    "bst": "binary search tree",
+    "priority queue": "heap",
+    "hashmap": "hash table",
+    "hash map": "hash table",
+    "dictionary": "hash table",
+    "backtrack": "backtracking",
+    "topological": "topological sort",
+}
+
+STOPWORDS = {
+    "a", "an", "and", "any", "are", "as", "at", "be", "by", "can", "each", "every", "find", "for", "from",
+    "given", "how", "i", "in", "into", "is", "it", "its", "me", "my", "of", "on", "one", "or", "other",
+    "return", "so", "that", "the", "their", "them", "then", "this", "to", "using", "what", "where",
+    "whether", "which", "with", "without", "you", "your", "check", "help", "solve", "problem", "leetcode", "valid",
+}
+
+LEETCODE_URL = "https://leetcode.com/problems/{slug}/"
+
+
+def tokenize(text: str) -> list:
+    """Lowercase word tokens without stopwords."""
+    return [w for w in re.findall(r"[a-z0-9]+", text.lower()) if w not in STOPWORDS and len(w) > 1]
+
+
+def _normalize(text: str) -> str:
+    return " " + " ".join(re.findall(r"[a-z0-9]+", text.lower())) + " "
+
+
+def _catalog_hash(raw: bytes) -> str:
+    return hashlib.sha1(raw).hexdigest()[:16]
+
+
+def _terms(problem: dict) -> Counter:
+    terms = Counter(tokenize(problem.get("description", "")))
+    for word in tokenize(problem["title"]):
+        terms[word] += TITLE_WEIGHT
+    for tag in problem.get("tags", []):
+        terms[f"tag:{tag}"] += 1
+    return terms
+
+
+def _weigh(terms: Counter, idf: dict) -> dict:
+    """TF-IDF weights (tags boosted), L2-normalised."""
+    vector = {}
+    for term, count in terms.items():
+        if term in idf:
+            weight = (1 + math.log(count)) * idf[term]
+            vector[term] = weight * TAG_WEIGHT if term.startswith("tag:") else weight
+    norm = math.sqrt(sum(w * w for w in vector.values())) or 1.0
+    return {term: w / norm for term, w in vector.items()}
+
+
+def build_graph(catalog: list, k: int = 5, postings_limit: int = 24, catalog_hash: str = "") -> dict:
+    """
+    Build the similarity graph and the pruned inverted index (offline).
+
+    Args:
+        catalog: Problems with id, title, slug, difficulty, tags and description
+        k: Neighbours stored per problem
+        postings_limit: Highest-weight postings kept per term for free-text search
+        catalog_hash: Hash of the catalog file, to detect a stale graph at load
+
+    Returns:
+        JSON-serialisable graph.
+    """
+    term_lists = [_terms(p) for p in catalog]
+    df = Counter(term for terms in term_lists for term in terms)
+    n = len(catalog)
+    idf = {term: round(math.log((1 + n) / (1 + count)) + 1, 4) for term, count in df.items()}
+    vectors = [_weigh(terms, idf) for terms in term_lists]
+
+    postings = {}
+    for i, vector in enumerate(vectors):
+        for term, weight in vector.items():
+            postings.setdefault(term, []).append([i, round(weight, 4)])
+
+    neighbors = {}
+    for i, vector in enumerate(vectors):
+        scores = Counter()
+        for term, weight in vector.items():
+            for j, other in postings[term]:
+                if j != i:
+                    scores[j] += weight * other
+        neighbors[str(catalog[i]["id"])] = [
+            [catalog[j]["id"], round(score, 4)] for j, score in scores.most_common(k)
+        ]
+
+    for term in postings:
+        postings[term] = sorted(postings[term], key=lambda p: -p[1])[:postings_limit]
+
+    return {
+        "version": 1,
+        "catalog_hash": catalog_hash,
+        "k": k,
+        "problems": [
+            {key: p[key] for key in ("id", "title", "slug", "difficulty", "tags")} for p in catalog
+        ],
+        "idf": idf,
+        "postings": postings,
+        "neighbors": neighbors,
+    }
+
+
+class ProblemIndex:
+    """In-memory similarity graph with exact-title lookup and approximate free-text search."""
+
+    def __init__(self, graph: dict, probe_terms: int = 8, min_score: float = 0.15, match_score: float = 0.4):
+        self.problems = graph["problems"]
+        self.by_id = {p["id"]: p for p in self.problems}
+        self.idf = graph["idf"]
+        self.postings = graph["postings"]
+        self.neighbors = {int(pid): edges for pid, edges in graph["neighbors"].items()}
+        self.probe_terms = probe_terms
+        self.min_score = min_score
+        self.match_score = match_score
+        # Longest names first so "Two Sum II" wins over "Two Sum"
+        names = []
+        for p in self.problems:
+            # Full title, slug, and the short forms students type ("Two Sum II", "Implement Trie")
+            for name in (p["title"], p["slug"], p["title"].split(" - ")[0], re.sub(r"\(.*?\)", "", p["title"])):
+                names.append((_normalize(name), p["id"]))
+        self._names = sorted(set(names), key=lambda item: -len(item[0]))
+        self._tags = sorted({t for p in self.problems for t in p["tags"]}, key=len, reverse=True)
+        self._lock = threading.Lock()
+        self.queries = 0
+        self.total_us = 0.0
+
+    @classmethod
+    def load(cls, graph_path, catalog_path) -> "ProblemIndex":
+        """Load the prebuilt graph, rebuilding it in memory if it is missing or stale."""
+        graph_path, catalog_path = Path(graph_path), Path(catalog_path)
+        try:
+            raw = catalog_path.read_bytes()
+        except OSError as e:
+            print(f"[WARNING] Problem catalog unavailable ({e}); similar-problem suggestions disabled")
+            return cls(build_graph([]))
+        digest = _catalog_hash(raw)
+        try:
+            graph = json.loads(graph_path.read_text(encoding="utf-8"))
+            if graph.get("catalog_hash") == digest:
+                return cls(graph)
+            print(f"[WARNING] {graph_path.name} is older than the catalog; rebuilding in memory "
+                  f"(run `python -m agents.similar_problems` to update it)")
+        except (OSError, ValueError):
+            print(f"[WARNING] {graph_path.name} not found; building the similarity graph in memory")
+        return cls(build_graph(json.loads(raw), catalog_hash=digest))
+
+    def match(self, text: str, exclude=()):
+        """Return the catalog problem named in the text (ids in ``exclude`` skipped), or None."""
+        normalized = _normalize(text)
+        for name, pid in self._names:
+            if name in normalized and pid not in exclude:
+                return self.by_id[pid]
+        return None
+
+    def search(self, text: str, k: int = 5, exclude=()) -> list:
+        """
+        Approximate nearest neighbours of free text over the pruned inverted index.
+
+        Returns:
+            List of (problem, score) pairs, best first.
+        """
+        terms = Counter(tokenize(text))
+        lowered = _normalize(text)
+        for tag in self._tags:
+            if f" {tag} " in lowered:
+                terms[f"tag:{tag}"] += 1
+        for alias, tag in TAG_ALIASES.items():
+            if f" {alias} " in lowered:
+                terms[f"tag:{tag}"] += 1
+        query = _weigh(terms, self.idf)
+        scores = Counter()
+        # Only the most informative query terms are probed
+        for term, weight in sorted(query.items(), key=lambda item: -item[1])[:self.probe_terms]:
+            for index, other in self.postings[term]:
+                scores[index] += weight * other
+        results = []
+        for index, score in scores.most_common():
+            problem = self.problems[index]
+            if score < self.min_score or len(results) >= k:
+                break
+            if problem["id"] not in exclude:
+                results.append((problem, round(score, 4)))
+        return results
+
+    def similar(self, text: str, k: int = 2) -> list:
+        """
+        Top-k problems to practise after the one in the text.
+
+        Args:
+            text: The student's question (or a problem name)
+            k: Number of suggestions
+
+        Returns:
+            Catalog problems, most similar first.
+        """
+        start = time.perf_counter()
+        problem = self.match(text)
+        hits = []
+        if problem is None:
+            hits = self.search(text, k + 1)
+            if hits and hits[0][1] >= self.match_score:
+                # A paraphrased problem statement: don't recommend the problem itself
+                problem = hits[0][0]
+        if problem is not None:
+            result = [self.by_id[pid] for pid, _ in self.neighbors.get(problem["id"], [])[:k]]
+        else:
+            result = [p for p, _ in hits[:k]]
+        with self._lock:
+            self.queries += 1
+            self.total_us += (time.perf_counter() - start) * 1e6
+        return result
+
+    def practice_section(self, text: str, k: int = 2) -> str:
+        """Markdown list of similar problems to append to an answer ("" if none)."""
+        if k <= 0:
+            return ""
+        suggestions = self.similar(text, k)
+        if not suggestions:
+            return ""
+        lines = [
+            f"- [{p['title']}]({LEETCODE_URL.format(slug=p['slug'])}) ({p['difficulty']}, {', '.join(p['tags'][:3])})"
+            for p in suggestions
+        ]
+        return "\n\n### 🔁 Similar Problems to Practice\n" + "\n".join(lines)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "problems": len(self.problems),
+                "queries": self.queries,
+                "avg_us": round(self.total_us / self.queries, 1) if self.queries else 0.0,
+            }
+
+
+base_dir = Path(__file__).resolve().parent.parent
+catalog_path = Path(os.getenv("PROBLEM_CATALOG", str(base_dir / "data" / "problems.json")))
+graph_path = Path(os.getenv("PROBLEM_GRAPH", str(base_dir / "data" / "problem_graph.json")))
+PRACTICE_SUGGESTIONS = int(os.getenv("PRACTICE_SUGGESTIONS", "2"))
+
+# Shared problem index, loaded once at startup
+problem_index = ProblemIndex.load(graph_path, catalog_path)
+
+
+if __name__ == "__main__":
+    raw = catalog_path.read_bytes()
+    graph = build_graph(json.loads(raw), catalog_hash=_catalog_hash(raw))
+    graph_path.write_text(json.dumps(graph, separators=(",", ":")) + "\n", encoding="utf-8")
+    print(f"Wrote {graph_path} ({len(graph['problems'])} problems, {len(graph['postings'])} terms)")
+    for title in sys.argv[1:]:
+        print(title, "->", [p["title"] for p in ProblemIndex(graph).similar(title, 3)])
@@ -0,0 +1,156 @@
+"""
+Staged Tutoring Workflow
+
+Instead of asking for all 8 steps in one 2048-token completion, staged mode
+generates the first stage (understanding through hints) up front and returns a
+continuation handle for the rest. Later stages (solution, code walk-through,
+complexity, practice) are generated when the student asks for them, or ahead
+of time by the prefetcher when there is spare capacity.
+
+Prefetching a stage spends the output tokens staging saves whenever the student
+stops early, so by default it only happens while no other request is running.
+
+Configured through environment variables:
+- STAGED_TTL_SECONDS   how long a continuation stays valid (default 1800)
+- STAGED_PREFETCH      off | idle | always: when to generate the next stage ahead (default idle)
+"""
+
+import os
+import time
+import uuid
+import threading
+
+from agents.tutor_agent import tutor_agent, WORKFLOW_STAGES
+from agents.prefetch import prefetcher
+
+
+class StagedWorkflow:
+    """Runs the workflow stage by stage and tracks pending continuations."""
+
+    def __init__(self, agent, prefetcher, ttl_seconds: float = 1800.0, max_pending: int = 1024,
+                 prefetch: str = "idle"):
+        self.agent = agent
+        self.prefetcher = prefetcher
+        self.prefetch = prefetch if prefetch in ("off", "idle", "always") else "idle"
+        self.ttl_seconds = ttl_seconds
+        self.max_pending = max_pending
+        self._pending = {}  # handle -> continuation state
+        self._lock = threading.Lock()
+
+    def start(self, sid: str, user_message: str, context: str = "", deadline=None, meta: dict = None) -> dict:
+        """
+        Generate the first stage and register a continuation for the rest.
+
+        Returns:
+            Dict with the stage ``response``, the ``continuation`` handle (or None)
+            and the names of the ``remaining_steps``. No continuation is created
+            when the first stage failed (``meta["fallback"]``).
+        """
+        meta = {} if meta is None else meta
+        response = self.agent.handle_stage(user_message, 0, context, deadline=deadline, meta=meta)
+        if meta.get("fallback"):
+            # Nothing to continue from: later stages would be built on the error text
+            return {"response": response, "continuation": None, "remaining_steps": []}
+        return self._advance(sid, user_message, context, 0, response)
+
+    def resume(self, sid: str, handle: str, deadline=None, meta: dict = None):
+        """
+        Generate (or take the prefetched) next stage for a continuation handle.
+
+        Returns:
+            Same shape as ``start``, or None if the handle is unknown or expired.
+            If the stage failed, the fallback text is returned with the same
+            handle so the student can retry.
+        """
+        with self._lock:
+            state = self._pending.get(handle)
+            if state is None or state["sid"] != sid:
+                # Another session's handle stays untouched
+                return None
+            del self._pending[handle]
+        if self._is_expired(state):
+            return None
+
+        meta = {} if meta is None else meta
+        stage = state["stage"]
+        try:
+            response = self.prefetcher.get((sid, "stage", handle), deadline=deadline)
+            if response is None:
+                response = self.agent.handle_stage(state["problem"], stage, state["context"], state["earlier"],
+                                                   deadline=deadline, meta=meta)
+        except Exception:
+            # Keep the continuation usable so the student can retry it
+            with self._lock:
+                self._pending[handle] = state
+            raise
+        if meta.get("fallback"):
+            with self._lock:
+                self._pending[handle] = state
+            return {
+                "response": response,
+                "continuation": handle,
+                "remaining_steps": [s["name"] for s in WORKFLOW_STAGES[stage:]],
+            }
+        earlier = f"{state['earlier']}\n\n{response}".strip()
+        return self._advance(sid, state["problem"], state["context"], stage, response, earlier)
+
+    def discard(self, sid: str):
+        """Forget every pending continuation of a session (e.g. on /clear)."""
+        with self._lock:
+            for handle in [h for h, state in self._pending.items() if state["sid"] == sid]:
+                del self._pending[handle]
+
+    def _advance(self, sid, problem, context, stage, response, earlier=None) -> dict:
+        next_stage = stage + 1
+        if next_stage >= len(WORKFLOW_STAGES):
+            return {"response": response, "continuation": None, "remaining_steps": []}
+
+        earlier = response if earlier is None else earlier
+        handle = uuid.uuid4().hex
+        with self._lock:
+            self._evict()
+            self._pending[handle] = {
+                "sid": sid,
+                "problem": problem,
+                "context": context,
+                "stage": next_stage,
+                "earlier": earlier,
+                "created": time.monotonic(),
+            }
+
+        # Warm the next stage while the student reads, if there is capacity to spare
+        if self._should_prefetch():
+            prompt = self.agent.stage_prompt(problem, next_stage, context, earlier)
+            self.prefetcher.schedule((sid, "stage", handle), self.agent.complete, prompt,
+                                     max_tokens=WORKFLOW_STAGES[next_stage]["max_tokens"],
+                                     deadline=self.prefetcher.job_deadline())
+
+        return {
+            "response": response,
+            "continuation": handle,
+            "remaining_steps": [s["name"] for s in WORKFLOW_STAGES[next_stage:]],
+        }
+
+    def _should_prefetch(self) -> bool:
+        if self.prefetch == "off" or not self.agent.available:
+            return False
+        # The request generating this stage is itself running in the foreground
+        return self.prefetch == "always" or self.prefetcher.idle(own=1)
+
+    def _evict(self):
+        for handle in [h for h, state in self._pending.items() if self._is_expired(state)]:
+            del self._pending[handle]
+        while len(self._pending) >= self.max_pending:
+            self._pending.pop(next(iter(self._pending)))
+
+    def _is_expired(self, state) -> bool:
+        return time.monotonic() - state["created"] > self.ttl_seconds
+
+
+# Shared staged workflow instance
+staged_workflow = StagedWorkflow(
+    tutor_agent,
+    prefetcher,
+    ttl_seconds=float(os.getenv("STAGED_TTL_SECONDS", "1800")),
+    prefetch=os.getenv("STAGED_PREFETCH", "idle"),
+)
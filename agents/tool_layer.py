@@ -0,0 +1,219 @@
+"""
+Async, Memoized Tool Layer for the ADK Agent
+
+Wraps plain tool functions so the ADK agent can run them concurrently. ADK
+dispatches the function calls of one model turn as parallel asyncio tasks, but
+only async tools actually overlap: a sync tool runs on the event loop and
+blocks the others. ``async_tool`` turns any tool into a coroutine function:
+
+- sync tools run in a worker thread (``asyncio.to_thread``); async tools are awaited
+- results are memoized by tool name + arguments in a shared LRU cache with a TTL
+- identical calls already in flight share one execution instead of recomputing;
+  the execution is its own task, so a caller that gets cancelled (e.g. by the
+  request deadline) does not take the result away from the others sharing it
+- per-tool call counts, cache hits, errors, cancellations and latency are recorded
+
+The wrapper keeps the tool's name, signature and docstring, which ADK uses to
+build the function declaration sent to the model, so it works the same for
+cheap lookups and for heavier engines (code execution, retrieval).
+
+Configured through environment variables:
+- TOOL_CACHE_SIZE          memoized results kept (default 256)
+- TOOL_CACHE_TTL_SECONDS   how long a memoized result is reused (default 600)
+"""
+
+import os
+import json
+import time
+import asyncio
+import inspect
+import threading
+import functools
+from collections import OrderedDict
+
+
+class ToolCache:
+    """Thread-safe LRU cache with a TTL, shared by all wrapped tools."""
+
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 600.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # key -> (stored_at, value)
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key):
+        """Return (True, value) on a fresh hit, (False, None) otherwise."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            if time.monotonic() - entry[0] > self.ttl_seconds:
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+            return True, entry[1]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class ToolMetrics:
+    """Per-tool call counts and latency."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tools = {}
+
+    def record(self, name: str, elapsed_ms: float, cached: bool = False, shared: bool = False,
+               failed: bool = False, cancelled: bool = False):
+        with self._lock:
+            m = self._tools.setdefault(name, {
+                "calls": 0, "cache_hits": 0, "shared": 0, "errors": 0, "cancelled": 0,
+                "executed": 0, "total_ms": 0.0, "max_ms": 0.0,
+            })
+            m["calls"] += 1
+            if cached:
+                m["cache_hits"] += 1
+            elif shared:
+                m["shared"] += 1
+            elif cancelled:
+                m["cancelled"] += 1
+            else:
+                m["executed"] += 1
+                m["total_ms"] += elapsed_ms
+                m["max_ms"] = max(m["max_ms"], elapsed_ms)
+            if failed:
+                m["errors"] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                name: {
+                    "calls": m["calls"],
+                    "cache_hits": m["cache_hits"],
+                    "shared_in_flight": m["shared"],
+                    "errors": m["errors"],
+                    "cancelled": m["cancelled"],
+                    "avg_ms": round(m["total_ms"] / m["executed"], 3) if m["executed"] else 0.0,
+                    "max_ms": round(m["max_ms"], 3),
+                }
+                for name, m in self._tools.items()
+            }
+
+
+tool_cache = ToolCache(
+    max_entries=int(os.getenv("TOOL_CACHE_SIZE", "256")),
+    ttl_seconds=float(os.getenv("TOOL_CACHE_TTL_SECONDS", "600")),
+)
+tool_metrics = ToolMetrics()
+
+# (loop, key) -> asyncio.Task of a call that is currently running
+_in_flight = {}
+
+
+def _cache_key(name: str, signature: inspect.Signature, args, kwargs):
+    bound = signature.bind(*args, **kwargs)
+    bound.apply_defaults()
+    return name, json.dumps(bound.arguments, sort_keys=True, default=repr)
+
+
+def async_tool(fn=None, *, memoize: bool = True):
+    """
+    Wrap a tool for concurrent, memoized execution.
+
+    Args:
+        fn: Sync or async tool function
+        memoize: Cache results by arguments (disable for non-deterministic tools)
+
+    Returns:
+        An async function with the same name, signature and docstring.
+    """
+    if fn is None:
+        return functools.partial(async_tool, memoize=memoize)
+
+    name = fn.__name__
+    signature = inspect.signature(fn)
+    is_async = inspect.iscoroutinefunction(fn)
+
+    async def execute(args, kwargs):
+        if is_async:
+            return await fn(*args, **kwargs)
+        # Keep the event loop free so sibling tool calls can run meanwhile
+        return await asyncio.to_thread(fn, *args, **kwargs)
+
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        if not memoize:
+            try:
+                result = await execute(args, kwargs)
+            except asyncio.CancelledError:
+                tool_metrics.record(name, (time.perf_counter() - start) * 1000, cancelled=True)
+                raise
+            except Exception:
+                tool_metrics.record(name, (time.perf_counter() - start) * 1000, failed=True)
+                raise
+            tool_metrics.record(name, (time.perf_counter() - start) * 1000)
+            return result
+
+        key = _cache_key(name, signature, args, kwargs)
+        hit, value = tool_cache.get(key)
+        if hit:
+            tool_metrics.record(name, 0.0, cached=True)
+            return value
+
+        loop = asyncio.get_running_loop()
+        pending = _in_flight.get((loop, key))
+        if pending is not None:
+            # Same call already running in this turn: share its result
+            tool_metrics.record(name, 0.0, shared=True)
+            return await asyncio.shield(pending)
+
+        # Run the call as its own task: cancelling this caller must not cancel
+        # the execution others are sharing (it still finishes and fills the cache)
+        task = loop.create_task(execute(args, kwargs))
+        _in_flight[(loop, key)] = task
+
+        def settle(done):
+            _in_flight.pop((loop, key), None)
+            if done.cancelled():
+                return
+            if done.exception() is None:  # also marks a failure retrieved when nobody waits
+                tool_cache.put(key, done.result())
+
+        task.add_done_callback(settle)
+        try:
+            result = await asyncio.shield(task)
+        except asyncio.CancelledError:
+            tool_metrics.record(name, (time.perf_counter() - start) * 1000, cancelled=True)
+            raise
+        except Exception:
+            tool_metrics.record(name, (time.perf_counter() - start) * 1000, failed=True)
+            raise
+
+        tool_metrics.record(name, (time.perf_counter() - start) * 1000)
+        return result
+
+    return wrapper
+
+
+def tool_stats() -> dict:
+    """Per-tool metrics plus cache occupancy, for the /status endpoint."""
+    return {
+        "tools": tool_metrics.snapshot(),
+        "cache_entries": len(tool_cache),
+        "cache_evictions": tool_cache.evictions,
+    }
@@ -0,0 +1,223 @@
+"""
+Shared HTTP Transport for the LLM Backends
+
+One pooled, keep-alive httpx transport shared by the Groq client and the
+Gemini model behind the ADK Runner, so concurrent Flask threads reuse warm
+connections instead of paying a TCP/TLS handshake on the hot path.
+
+Configured through environment variables:
+- HTTP_MAX_CONNECTIONS     max open connections per client (default 20)
+- HTTP_MAX_KEEPALIVE       idle connections kept alive (default 10)
+- HTTP_KEEPALIVE_EXPIRY    seconds an idle connection is kept (default 60)
+- HTTP_CONNECT_TIMEOUT     connect timeout in seconds (default 5)
+- HTTP_READ_TIMEOUT        read/write/pool timeout in seconds (default 60)
+- HTTP2                    use HTTP/2 when the `h2` package is installed (default 1)
+"""
+
+import os
+import atexit
+import time
+import threading
+import importlib.util
+
+import httpx
+
+
+class TransportStats:
+    """Thread-safe request and connection counters."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests_total = 0
+        self.requests_active = 0
+        self.requests_failed = 0
+        self.connections_opened = 0
+        self.tls_handshakes = 0
+        self.request_seconds = 0.0
+
+    def begin(self):
+        with self._lock:
+            self.requests_total += 1
+            self.requests_active += 1
+
+    def end(self, elapsed: float, failed: bool):
+        with self._lock:
+            self.requests_active -= 1
+            self.request_seconds += elapsed
+            if failed:
+                self.requests_failed += 1
+
+    def trace(self, event_name: str, info: dict):
+        """httpcore trace hook: count new connections and TLS handshakes."""
+        if event_name == "connection.connect_tcp.complete":
+            with self._lock:
+                self.connections_opened += 1
+        elif event_name == "connection.start_tls.complete":
+            with self._lock:
+                self.tls_handshakes += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "requests_total": self.requests_total,
+                "requests_active": self.requests_active,
+                "requests_failed": self.requests_failed,
+                "connections_opened": self.connections_opened,
+                "tls_handshakes": self.tls_handshakes,
+                "avg_request_ms": round(1000 * self.request_seconds / self.requests_total, 1) if self.requests_total else 0.0,
+            }
+
+
+def _chain_trace(request: httpx.Request, stats: TransportStats):
+    """Install the stats trace hook without dropping a caller-provided one."""
+    existing = request.extensions.get("trace")
+
+    def trace(event_name, info):
+        stats.trace(event_name, info)
+        if existing:
+            existing(event_name, info)
+
+    request.extensions["trace"] = trace
+
+
+async def _chain_trace_async(request: httpx.Request, stats: TransportStats):
+    existing = request.extensions.get("trace")
+
+    async def trace(event_name, info):
+        stats.trace(event_name, info)
+        if existing:
+            await existing(event_name, info)
+
+    request.extensions["trace"] = trace
+
+
+class _CountingTransport(httpx.HTTPTransport):
+    def __init__(self, stats: TransportStats, **kwargs):
+        super().__init__(**kwargs)
+        self._stats = stats
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        _chain_trace(request, self._stats)
+        self._stats.begin()
+        start = time.perf_counter()
+        failed = True
+        try:
+            response = super().handle_request(request)
+            failed = False
+            return response
+        finally:
+            self._stats.end(time.perf_counter() - start, failed)
+
+
+class _CountingAsyncTransport(httpx.AsyncHTTPTransport):
+    def __init__(self, stats: TransportStats, **kwargs):
+        super().__init__(**kwargs)
+        self._stats = stats
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        await _chain_trace_async(request, self._stats)
+        self._stats.begin()
+        start = time.perf_counter()
+        failed = True
+        try:
+            response = await super().handle_async_request(request)
+            failed = False
+            return response
+        finally:
+            self._stats.end(time.perf_counter() - start, failed)
+
+
+def _pool_usage(transport) -> dict:
+    """Best-effort view of the httpcore connection pool behind a transport."""
+    pool = getattr(transport, "_pool", None)
+    connections = list(getattr(pool, "connections", []) or [])
+    idle = sum(1 for c in connections if c.is_idle())
+    return {"open": len(connections), "idle": idle, "busy": len(connections) - idle}
+
+
+class SharedTransport:
+    """Lazily builds one sync and one async pooled httpx client with shared settings."""
+
+    def __init__(self, max_connections: int = 20, max_keepalive: int = 10, keepalive_expiry: float = 60.0,
+                 connect_timeout: float = 5.0, read_timeout: float = 60.0, http2: bool = True):
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        # HTTP/2 needs the optional `h2` package; fall back to keep-alive HTTP/1.1 without it
+        self.http2 = http2 and importlib.util.find_spec("h2") is not None
+
+        self.sync_stats = TransportStats()
+        self.async_stats = TransportStats()
+        self._sync_client = None
+        self._async_client = None
+        self._lock = threading.Lock()
+
+    @property
+    def sync_client(self) -> httpx.Client:
+        """Thread-safe client shared by all Flask worker threads (Groq)."""
+        with self._lock:
+            if self._sync_client is None:
+                transport = _CountingTransport(self.sync_stats, limits=self.limits, http2=self.http2)
+                self._sync_client = httpx.Client(transport=transport, timeout=self.timeout)
+            return self._sync_client
+
+    @property
+    def async_client(self) -> httpx.AsyncClient:
+        """
+        Async client for the Gemini backend.
+
+        Connections are bound to the event loop that first uses them, so this
+        must only be used from the ADK runner loop.
+        """
+        with self._lock:
+            if self._async_client is None:
+                transport = _CountingAsyncTransport(self.async_stats, limits=self.limits, http2=self.http2)
+                self._async_client = httpx.AsyncClient(transport=transport, timeout=self.timeout)
+            return self._async_client
+
+    def stats(self) -> dict:
+        """Pool configuration, utilisation and request counters for both clients."""
+        result = {
+            "http2": self.http2,
+            "max_connections": self.limits.max_connections,
+            "max_keepalive": self.limits.max_keepalive_connections,
+            "connect_timeout": self.timeout.connect,
+            "read_timeout": self.timeout.read,
+        }
+        for name, client, stats in (("sync", self._sync_client, self.sync_stats),
+                                    ("async", self._async_client, self.async_stats)):
+            entry = stats.snapshot()
+            entry["pool"] = _pool_usage(client._transport) if client is not None else {"open": 0, "idle": 0, "busy": 0}
+            result[name] = entry
+        return result
+
+    def close(self):
+        """Close the sync client. The async client is closed by ``aclose`` on its own loop."""
+        with self._lock:
+            if self._sync_client is not None:
+                self._sync_client.close()
+                self._sync_client = None
+
+    async def aclose(self):
+        """Close the async client; await this on the event loop that used it."""
+        with self._lock:
+            client, self._async_client = self._async_client, None
+        if client is not None:
+            await client.aclose()
+
+
+# Shared transport instance
+shared_transport = SharedTransport(
+    max_connections=int(os.getenv("HTTP_MAX_CONNECTIONS", "20")),
+    max_keepalive=int(os.getenv("HTTP_MAX_KEEPALIVE", "10")),
+    keepalive_expiry=float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60")),
+    connect_timeout=float(os.getenv("HTTP_CONNECT_TIMEOUT", "5")),
+    read_timeout=float(os.getenv("HTTP_READ_TIMEOUT", "60")),
+    http2=os.getenv("HTTP2", "1") not in ("0", "false", "False"),
+)
+
+# The async client is closed on the ADK runner loop (agents/adk_runner.py)
+atexit.register(shared_transport.close)
@@ -1,9 +1,15 @@
 import os
 import time
+import httpx
 from dotenv import load_dotenv
 
 load_dotenv()
 
+from agents.dsa_tools import get_leetcode_hints
+from agents.transport import shared_transport
+from agents.deadline import RequestCancelled, deadline_stats
+from agents.profiling import profiled
+
 # Configure Gemini (NEW SDK)
 try:
     from groq import Groq
@@ -11,7 +17,8 @@ try:
     api_key = os.getenv("GROQ_API_KEY")
     if not api_key:
         raise ValueError("GROQ_API_KEY not set")
-    client = Groq(api_key=api_key)
+    # Pooled keep-alive connections shared with the Gemini backend (see agents/transport.py)
+    client = Groq(api_key=api_key, http_client=shared_transport.sync_client, timeout=shared_transport.timeout)
     print("[DEBUG] Groq client initialized successfully")
 except Exception as e:
     print(f"[WARNING] Failed to initialize Groq: {e}")
@@ -119,9 +126,8 @@ STEP 7: COMPLEXITY ANALYSIS
 - Explain what they mean in simple language.
 
 STEP 8: LEARNING REINFORCEMENT
-- Suggest:
-  - 1–2 similar LeetCode problems to practice
-  - A small practice variation
+- Suggest a small practice variation.
+- Do NOT list similar LeetCode problems; they are added after your answer from the problem catalog.
 - Encourage the student.
 
 --------------------------------------------------
@@ -163,63 +169,149 @@ By the end of the interaction, the student should:
 You are a TUTOR, not just a code generator.
 """
 
+# Groq models tried in order after the optional MODEL_NAME override
+MODEL_CANDIDATES = ["llama-3.1-8b-instant", "llama-3.3-70b-versatile", "qwen/qwen3-32b"]
+
+WORKFLOW_INSTRUCTIONS = """Provide a comprehensive, pedagogical response following the 8-step workflow above.
+Use markdown formatting with clear headings.
+Remember: You are a TUTOR, not a code generator."""
+
+HINT_INSTRUCTIONS = """The student is stuck and asked for HINT {level} of 3 (STEP 4 only).
+- Give ONLY this hint level, building on any earlier hints.
+- Level 1 is a gentle nudge, level 2 names the technique, level 3 outlines the algorithm.
+- Do NOT give the full Python solution.
+- Reference hint from the tutor toolkit: {reference}
+Use markdown formatting and keep it short and encouraging."""
+
+# Staged mode: generate the workflow in chunks, later chunks only on demand
+WORKFLOW_STAGES = [
+    {"name": "approach", "steps": "STEP 1 to STEP 4 (understanding, concept, approach and hints)", "max_tokens": 1024},
+    {"name": "solution", "steps": "STEP 5 and STEP 6 (Python solution and code explanation)", "max_tokens": 1024},
+    {"name": "practice", "steps": "STEP 7 and STEP 8 (complexity analysis and learning reinforcement)", "max_tokens": 512},
+]
+
+STAGE_INSTRUCTIONS = """Follow the 8-step workflow above, but write ONLY {steps}.
+{earlier}Stop after the last of these steps; the student will ask for the rest when ready.
+Use markdown formatting with clear headings.
+Remember: You are a TUTOR, not a code generator."""
+
+# Max characters of earlier stages carried into a continuation prompt
+STAGE_CARRYOVER_CHARS = 3000
+
+
+def _request_timeout(deadline) -> httpx.Timeout:
+    """Upstream timeout for one call: the pool's connect/read limits, capped by the deadline."""
+    remaining = deadline.timeout()
+    limits = shared_transport.timeout
+    return httpx.Timeout(min(remaining, limits.read), connect=min(remaining, limits.connect))
+
+
+def _mark_fallback(meta: dict):
+    """Flag in ``meta`` that the text returned is a fallback, not a model answer."""
+    if meta is not None:
+        meta["fallback"] = True
+
+
+def _record_usage(source, usage: dict):
+    """Copy token counts from a Groq usage object into a plain dict."""
+    if source is None:
+        return
+    for field in ("prompt_tokens", "completion_tokens", "total_tokens"):
+        value = getattr(source, field, None)
+        if value is not None:
+            usage[field] = value
+
+
 class DSATutorAgent:
     def __init__(self):
         self.name = "DSA_Tutor_Agent"
         self.description = "Student-Focused DSA & Python Tutor using Groq"
 
-    def handle(self, user_message: str, context: str = "") -> str:
-        """
-        Handle student question/problem using pedagogical workflow with retry logic.
-        Uses Groq API (chat.completions format).
-        """
-        if not client:
-            return "⚠️ AI service not available. Please try again later."
-        
-        try:
-            full_prompt = f"""{SYSTEM_PROMPT}
+    @property
+    def available(self) -> bool:
+        """Whether a model is configured (without one every call falls back)."""
+        return client is not None
+
+    @profiled("prompt.build")
+    def build_prompt(self, user_message: str, context: str = "", instructions: str = WORKFLOW_INSTRUCTIONS) -> str:
+        """Assemble the full prompt sent to the model."""
+        return f"""{SYSTEM_PROMPT}
 
 {context if context else ''}
 
 STUDENT QUESTION/PROBLEM:
 {user_message}
 
-Provide a comprehensive, pedagogical response following the 8-step workflow above.
-Use markdown formatting with clear headings.
-Remember: You are a TUTOR, not a code generator.
+{instructions}
 """
 
-            # Retry logic: attempt up to 3 rounds; try multiple candidate models (env override + Groq models)
-            last_exc = None
-            env_model = os.getenv("MODEL_NAME")
-            # Candidate list: env override first, then Groq model names
-            candidates = []
-            if env_model:
-                candidates.append(env_model)
-            candidates.extend([m for m in ["llama-3.1-8b-instant", "llama-3.3-70b-versatile", "qwen/qwen3-32b"] if m not in candidates])
+    def hint_prompt(self, problem: str, hint_level: int, context: str = "") -> str:
+        """Build the prompt for one rung of the hint ladder (1-3) for a problem."""
+        hint_level = max(1, min(3, hint_level))
+        reference = get_leetcode_hints(problem, hint_level)
+        instructions = HINT_INSTRUCTIONS.format(level=hint_level, reference=reference)
+        return self.build_prompt(problem, context, instructions)
+
+    def stage_prompt(self, user_message: str, stage: int, context: str = "", earlier: str = "") -> str:
+        """Build the prompt for one stage of the staged workflow (see WORKFLOW_STAGES)."""
+        if earlier:
+            earlier = f"Steps already given to the student (continue from here, do not repeat them):\n{earlier[-STAGE_CARRYOVER_CHARS:]}\n\n"
+        instructions = STAGE_INSTRUCTIONS.format(steps=WORKFLOW_STAGES[stage]["steps"], earlier=earlier)
+        return self.build_prompt(user_message, context, instructions)
+
+    @profiled("model.complete")
+    def complete(self, full_prompt: str, max_tokens: int = 2048, deadline=None, meta: dict = None,
+                 models: list = None) -> str:
+        """
+        Send a prompt to Groq with retry logic and return the response text.
+
+        Args:
+            full_prompt: Prompt built by build_prompt/hint_prompt/stage_prompt
+            max_tokens: Output token budget
+            deadline: Optional agents.deadline.Deadline bounding retries and generation
+            meta: Optional dict filled with the ``model`` that answered and its token usage
+            models: Only try these models (e.g. when replaying traffic against one model);
+                defaults to MODEL_NAME followed by MODEL_CANDIDATES
+
+        Raises:
+            RuntimeError: If no model returned content after all retries.
+            RequestCancelled: If the deadline passed or the request was cancelled.
+        """
+        if not client:
+            raise RuntimeError("Groq client not initialized")
+
+        # Retry logic: attempt up to 3 rounds; try multiple candidate models (env override + Groq models)
+        last_exc = None
+        env_model = os.getenv("MODEL_NAME")
+        # Candidate list: env override first, then Groq model names
+        candidates = []
+        if env_model:
+            candidates.append(env_model)
+        candidates.extend([m for m in MODEL_CANDIDATES if m not in candidates])
+        if models:
+            candidates = list(models)
 
+        try:
             for attempt in range(1, 4):
                 for model_name in candidates:
                     try:
                         print(f"[DEBUG] Attempt {attempt}/3 — trying model '{model_name}'")
-                        response = client.chat.completions.create(
-                            model=model_name,
-                            messages=[
-                                {"role": "user", "content": full_prompt}
-                            ],
-                            temperature=0.7,
-                            max_tokens=2048
-                        )
-
-                        print(f"[DEBUG] Response received type: {type(response)}")
-                        if response and response.choices and len(response.choices) > 0:
-                            content = response.choices[0].message.content
-                            if content:
-                                print(f"[DEBUG] Success with model '{model_name}' on attempt {attempt}")
-                                return content
+                        usage = {}
+                        if deadline is None:
+                            content = self._create(model_name, full_prompt, max_tokens, usage)
+                        else:
+                            content = self._create_streaming(model_name, full_prompt, max_tokens, deadline, usage)
+                        if content:
+                            print(f"[DEBUG] Success with model '{model_name}' on attempt {attempt}")
+                            if meta is not None:
+                                meta["model"] = model_name
+                                meta.update(usage)
+                            return content
 
                         last_exc = RuntimeError(f"Empty or invalid response from API (model={model_name}, attempt={attempt})")
                         print(f"[DEBUG] {last_exc}")
+                    except RequestCancelled:
+                        raise
                     except Exception as e:
                         print(f"[DEBUG] Exception with model '{model_name}' on attempt {attempt}: {type(e).__name__}: {e}")
                         last_exc = e
@@ -227,25 +319,172 @@ Remember: You are a TUTOR, not a code generator.
                 if attempt < 3:
                     wait_time = 0.5 * attempt
                     print(f"[DEBUG] Waiting {wait_time}s before next round...")
-                    time.sleep(wait_time)
+                    if deadline is None:
+                        time.sleep(wait_time)
+                    else:
+                        deadline.sleep(wait_time)
+        except RequestCancelled as e:
+            # Cancelled between calls: nothing in flight, the whole budget goes unused
+            if not getattr(e, "recorded", False):
+                deadline_stats.record(e.reason, unused_budget=max_tokens)
+            raise
+
+        raise RuntimeError(f"Groq API failed after retries: {last_exc}")
+
+    def _create(self, model_name: str, full_prompt: str, max_tokens: int, usage: dict) -> str:
+        response = client.chat.completions.create(
+            model=model_name,
+            messages=[
+                {"role": "user", "content": full_prompt}
+            ],
+            temperature=0.7,
+            max_tokens=max_tokens
+        )
+
+        print(f"[DEBUG] Response received type: {type(response)}")
+        _record_usage(getattr(response, "usage", None), usage)
+        if response and response.choices and len(response.choices) > 0:
+            return response.choices[0].message.content
+        return None
+
+    def _create_streaming(self, model_name: str, full_prompt: str, max_tokens: int, deadline, usage: dict) -> str:
+        """Stream the completion so it can be aborted mid-generation when the deadline fires."""
+        stream = client.chat.completions.create(
+            model=model_name,
+            messages=[
+                {"role": "user", "content": full_prompt}
+            ],
+            temperature=0.7,
+            max_tokens=max_tokens,
+            stream=True,
+            timeout=_request_timeout(deadline)
+        )
+
+        parts = []
+        try:
+            for chunk in stream:
+                deadline.check()
+                if chunk.choices and chunk.choices[0].delta.content:
+                    parts.append(chunk.choices[0].delta.content)
+                if getattr(chunk, "x_groq", None):
+                    # Groq reports usage on the final chunk
+                    _record_usage(chunk.x_groq.usage, usage)
+        except RequestCancelled as e:
+            # Closing the stream drops the upstream connection and stops generation
+            generated = len(parts)  # ~one token per streamed delta
+            deadline_stats.record(e.reason, unused_budget=max_tokens - generated,
+                                  tokens_discarded=generated, stream_aborted=True)
+            e.recorded = True
+            print(f"[DEBUG] Aborted stream from '{model_name}' after ~{generated} tokens: {e.reason}")
+            raise
+        finally:
+            stream.close()
+
+        return "".join(parts)
+
+    def fallback_response(self, user_message: str) -> str:
+        """Static study guide returned when the model cannot be reached."""
+        fallback = "### 🤖 Tutor Response\n\n"
+        fallback += "I'm having temporary trouble reaching the AI model, but I can still help!\n\n"
+        fallback += "**Problem Summary:**\n"
+        fallback += (user_message[:200] + '...' if len(user_message) > 200 else user_message) + "\n\n"
+        fallback += "**General Approach:**\n"
+        fallback += "1. **Understand**: Break down what input you have and what output is needed.\n"
+        fallback += "2. **Identify DSA Concept**: Think about arrays, hashing, two-pointers, recursion, or dynamic programming.\n"
+        fallback += "3. **Design**: Work through a small example by hand.\n"
+        fallback += "4. **Code**: Write clean Python code with comments.\n"
+        fallback += "5. **Analyze**: Calculate time and space complexity.\n\n"
+        fallback += "**Try Again**: Send your question again and I'll attempt a full AI-powered response!"
+        return fallback
+
+    @profiled("tutor.handle")
+    def handle(self, user_message: str, context: str = "", deadline=None, meta: dict = None) -> str:
+        """
+        Handle student question/problem using pedagogical workflow with retry logic.
+        Uses Groq API (chat.completions format).
 
-            # Graceful fallback if all retries fail
-            print(f"[ERROR] Groq API failed after retries: {last_exc}")
-            fallback = "### 🤖 Tutor Response\n\n"
-            fallback += "I'm having temporary trouble reaching the AI model, but I can still help!\n\n"
-            fallback += "**Problem Summary:**\n"
-            fallback += (user_message[:200] + '...' if len(user_message) > 200 else user_message) + "\n\n"
-            fallback += "**General Approach:**\n"
-            fallback += "1. **Understand**: Break down what input you have and what output is needed.\n"
-            fallback += "2. **Identify DSA Concept**: Think about arrays, hashing, two-pointers, recursion, or dynamic programming.\n"
-            fallback += "3. **Design**: Work through a small example by hand.\n"
-            fallback += "4. **Code**: Write clean Python code with comments.\n"
-            fallback += "5. **Analyze**: Calculate time and space complexity.\n\n"
-            fallback += "**Try Again**: Send your question again and I'll attempt a full AI-powered response!"
-            return fallback
+        Raises:
+            RequestCancelled: If the request's deadline passed or it was cancelled.
+        """
+        if not client:
+            _mark_fallback(meta)
+            return "⚠️ AI service not available. Please try again later."
 
+        try:
+            return self.complete(self.build_prompt(user_message, context), deadline=deadline, meta=meta)
+        except RequestCancelled:
+            raise
+        except RuntimeError as e:
+            # Graceful fallback if all retries fail
+            print(f"[ERROR] {e}")
+            _mark_fallback(meta)
+            return self.fallback_response(user_message)
         except Exception as e:
             print(f"[ERROR] Unexpected error in handle(): {e}")
+            _mark_fallback(meta)
+            return f"❌ Unexpected error: {str(e)}\n\nPlease refresh and try again."
+
+    @profiled("tutor.handle_hint")
+    def handle_hint(self, problem: str, hint_level: int, context: str = "", deadline=None, meta: dict = None) -> str:
+        """
+        Give the next rung of the hint ladder for the student's current problem.
+
+        Args:
+            problem: The problem the student is working on
+            hint_level: Hint level to give (1=basic, 2=medium, 3=detailed)
+            context: Previous conversation context
+            deadline: Optional request deadline
+            meta: Optional dict filled with the model and token usage
+
+        Returns:
+            The hint as markdown.
+        """
+        if not client:
+            return get_leetcode_hints(problem, hint_level)
+
+        try:
+            return self.complete(self.hint_prompt(problem, hint_level, context), max_tokens=512,
+                                 deadline=deadline, meta=meta)
+        except RequestCancelled:
+            raise
+        except Exception as e:
+            print(f"[ERROR] Hint generation failed: {e}")
+            return get_leetcode_hints(problem, hint_level)
+
+    @profiled("tutor.handle_stage")
+    def handle_stage(self, user_message: str, stage: int, context: str = "", earlier: str = "",
+                     deadline=None, meta: dict = None) -> str:
+        """
+        Generate a single stage of the workflow instead of all 8 steps at once.
+
+        Args:
+            user_message: The student's problem
+            stage: Index into WORKFLOW_STAGES
+            context: Previous conversation context
+            earlier: Text of the stages already shown to the student
+            deadline: Optional request deadline
+            meta: Optional dict filled with the model and token usage
+
+        Returns:
+            The stage as markdown. If no model answered, a fallback message is
+            returned and ``meta["fallback"]`` is set.
+        """
+        if not client:
+            _mark_fallback(meta)
+            return "⚠️ AI service not available. Please try again later."
+
+        try:
+            prompt = self.stage_prompt(user_message, stage, context, earlier)
+            return self.complete(prompt, max_tokens=WORKFLOW_STAGES[stage]["max_tokens"], deadline=deadline, meta=meta)
+        except RequestCancelled:
+            raise
+        except RuntimeError as e:
+            print(f"[ERROR] {e}")
+            _mark_fallback(meta)
+            return self.fallback_response(user_message)
+        except Exception as e:
+            print(f"[ERROR] Unexpected error in handle_stage(): {e}")
+            _mark_fallback(meta)
             return f"❌ Unexpected error: {str(e)}\n\nPlease refresh and try again."
 
 
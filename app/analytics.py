@@ -0,0 +1,284 @@
+"""
+Learning Analytics for Instructors
+
+Every chat turn is appended to a compact JSON Lines event log and folded into
+in-memory aggregates (top problems and concepts per cohort, hint-escalation
+rates, per-student progress) as it is recorded. Queries read the aggregates
+directly, so they take milliseconds no matter how long the log grows.
+
+Writes are batched off the request path: ``record`` only updates the
+aggregates and enqueues the event; a background thread appends batches to the
+log. On startup the aggregates are rebuilt by replaying the log once.
+
+Students are identified by pseudonym (app/anonymize.py), never by session id.
+
+Configured through environment variables:
+- ANALYTICS_ENABLED          record events (default 1)
+- ANALYTICS_LOG              path of the event log (default analytics/events.jsonl)
+- ANALYTICS_FLUSH_SECONDS    max delay before a batch is written (default 2)
+"""
+
+import os
+import json
+import time
+import queue
+import atexit
+import threading
+from collections import Counter
+from pathlib import Path
+
+# Compact on-disk keys -> readable field names
+FIELDS = {
+    "t": "timestamp",
+    "c": "cohort",
+    "s": "student",
+    "p": "problem",
+    "k": "concept",
+    "h": "hint_level",
+    "m": "model",
+    "l": "latency_ms",
+    "pt": "prompt_tokens",
+    "ct": "completion_tokens",
+    "x": "kind",
+}
+
+
+class Aggregates:
+    """Incrementally maintained counters over the event stream."""
+
+    def __init__(self):
+        self.total_events = 0
+        self.cohorts = {}   # cohort -> counters
+        self.students = {}  # student -> progress
+        self.models = {}    # model -> latency/token totals
+
+    def add(self, event: dict):
+        """Fold one (compact) event into the aggregates in O(1)."""
+        self.total_events += 1
+        cohort = self.cohorts.setdefault(event.get("c", "default"), {
+            "turns": 0,
+            "students": set(),
+            "problems": Counter(),
+            "concepts": Counter(),
+            "hint_levels": Counter(),
+        })
+        cohort["turns"] += 1
+        cohort["students"].add(event.get("s"))
+        problem = event.get("p")
+        if problem:
+            cohort["problems"][problem] += 1
+        if event.get("k"):
+            cohort["concepts"][event["k"]] += 1
+        hint_level = event.get("h", 0)
+        if hint_level:
+            cohort["hint_levels"][hint_level] += 1
+
+        student = self.students.setdefault(event.get("s"), {
+            "cohort": event.get("c", "default"),
+            "turns": 0,
+            "hints": 0,
+            "problems": {},  # problem -> highest hint level needed
+            "first_seen": event.get("t"),
+            "last_seen": event.get("t"),
+        })
+        student["turns"] += 1
+        student["last_seen"] = event.get("t")
+        if hint_level:
+            student["hints"] += 1
+        if problem:
+            student["problems"][problem] = max(student["problems"].get(problem, 0), hint_level)
+
+        model = self.models.setdefault(event.get("m") or "unknown", {
+            "turns": 0, "latency_ms": 0, "prompt_tokens": 0, "completion_tokens": 0,
+        })
+        model["turns"] += 1
+        model["latency_ms"] += event.get("l", 0)
+        model["prompt_tokens"] += event.get("pt", 0)
+        model["completion_tokens"] += event.get("ct", 0)
+
+    def cohort_summary(self, cohort: str, top: int = 10) -> dict:
+        counters = self.cohorts.get(cohort)
+        if counters is None:
+            return None
+        levels = counters["hint_levels"]
+        asked = sum(levels.values())
+        return {
+            "cohort": cohort,
+            "turns": counters["turns"],
+            "students": len(counters["students"]),
+            "top_problems": counters["problems"].most_common(top),
+            "top_concepts": counters["concepts"].most_common(top),
+            "hint_requests": asked,
+            # Of the students who took hint N, how often did they need hint N+1?
+            "hint_escalation": {
+                "1_to_2": round(levels[2] / levels[1], 3) if levels[1] else 0.0,
+                "2_to_3": round(levels[3] / levels[2], 3) if levels[2] else 0.0,
+            },
+        }
+
+    def cohort_students(self, cohort: str) -> list:
+        """Students seen in a cohort with their headline progress, most recently active first."""
+        counters = self.cohorts.get(cohort)
+        if counters is None:
+            return None
+        students = []
+        for student in counters["students"]:
+            progress = self.students.get(student)
+            if progress is None:
+                continue
+            students.append({
+                "student": student,
+                "turns": progress["turns"],
+                "hints": progress["hints"],
+                "problems_attempted": len(progress["problems"]),
+                "last_seen": progress["last_seen"],
+            })
+        students.sort(key=lambda s: (-(s["last_seen"] or 0), s["student"]))
+        return students
+
+    def student_progress(self, student: str) -> dict:
+        progress = self.students.get(student)
+        if progress is None:
+            return None
+        return {
+            "student": student,
+            "cohort": progress["cohort"],
+            "turns": progress["turns"],
+            "hints": progress["hints"],
+            "problems_attempted": len(progress["problems"]),
+            "problems_without_hints": sum(1 for level in progress["problems"].values() if level == 0),
+            "problems": progress["problems"],
+            "first_seen": progress["first_seen"],
+            "last_seen": progress["last_seen"],
+        }
+
+    def model_summary(self) -> dict:
+        return {
+            name: {
+                "turns": m["turns"],
+                "avg_latency_ms": round(m["latency_ms"] / m["turns"], 1),
+                "avg_completion_tokens": round(m["completion_tokens"] / m["turns"], 1),
+                "prompt_tokens": m["prompt_tokens"],
+                "completion_tokens": m["completion_tokens"],
+            }
+            for name, m in self.models.items()
+        }
+
+
+class AnalyticsLog:
+    """Append-only event log with batched background writes."""
+
+    def __init__(self, path, flush_seconds: float = 2.0, batch_size: int = 100, enabled: bool = True):
+        self.path = Path(path)
+        self.flush_seconds = flush_seconds
+        self.batch_size = batch_size
+        self.enabled = enabled
+        self.aggregates = Aggregates()
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._writer = None
+
+        if self.enabled:
+            self._replay()
+            self._writer = threading.Thread(target=self._write_loop, name="analytics-writer", daemon=True)
+            self._writer.start()
+            atexit.register(self.flush)
+
+    def record(self, **fields):
+        """
+        Record one chat turn. Cheap enough for the request path: the aggregates
+        are updated in place and the event is handed to the writer thread.
+
+        Keyword Args:
+            Readable field names from FIELDS (cohort, student, problem, ...).
+        """
+        if not self.enabled:
+            return
+        event = {"t": round(time.time(), 3)}
+        for short, name in FIELDS.items():
+            value = fields.get(name)
+            if value not in (None, "", 0) and short != "t":
+                event[short] = value
+        with self._lock:
+            self.aggregates.add(event)
+        self._queue.put(event)
+
+    def summary(self, cohort: str = "default", top: int = 10):
+        with self._lock:
+            return self.aggregates.cohort_summary(cohort, top)
+
+    def cohorts(self) -> list:
+        with self._lock:
+            return sorted(self.aggregates.cohorts)
+
+    def students(self, cohort: str = "default"):
+        with self._lock:
+            return self.aggregates.cohort_students(cohort)
+
+    def student(self, student: str):
+        with self._lock:
+            return self.aggregates.student_progress(student)
+
+    def models(self) -> dict:
+        with self._lock:
+            return self.aggregates.model_summary()
+
+    def flush(self, timeout: float = 5.0):
+        """Block until every event recorded so far is on disk (used at exit and in tests)."""
+        if self._writer is None:
+            return
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+
+    def _write_loop(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_seconds
+            while len(batch) < self.batch_size and not isinstance(batch[-1], threading.Event):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._append([e for e in batch if not isinstance(e, threading.Event)])
+            for marker in batch:
+                if isinstance(marker, threading.Event):
+                    marker.set()
+
+    def _append(self, batch):
+        if not batch:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("".join(json.dumps(e, separators=(",", ":")) + "\n" for e in batch))
+        except OSError as e:
+            print(f"[ERROR] Analytics write failed ({len(batch)} events dropped): {e}")
+
+    def _replay(self):
+        """Rebuild aggregates from the existing log (startup only)."""
+        if not self.path.exists():
+            return
+        count = 0
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    continue  # torn final line after a crash
+                self.aggregates.add(event)
+                count += 1
+        print(f"[DEBUG] Analytics: replayed {count} events from {self.path}")
+
+
+base_dir = Path(__file__).resolve().parent.parent
+
+# Shared analytics log instance
+analytics = AnalyticsLog(
+    os.getenv("ANALYTICS_LOG", str(base_dir / "analytics" / "events.jsonl")),
+    flush_seconds=float(os.getenv("ANALYTICS_FLUSH_SECONDS", "2")),
+    enabled=os.getenv("ANALYTICS_ENABLED", "1") not in ("0", "false", "False"),
+)
@@ -0,0 +1,20 @@
+"""
+Student Pseudonyms
+
+The session id is the key to a student's cookie session, so logs never store
+it. Analytics and traffic capture both record the same salted hash instead,
+which keeps the two joinable without exposing the id.
+
+Configured through environment variables:
+- STUDENT_ID_SALT   salt for the hash (default: FLASK_SECRET_KEY)
+"""
+
+import os
+import hashlib
+
+DEFAULT_SALT = os.getenv("STUDENT_ID_SALT") or os.getenv("FLASK_SECRET_KEY", "dev-secret-key-change-in-production")
+
+
+def student_pseudonym(sid: str, salt: str = None) -> str:
+    """Stable, non-reversible 12-character id for a session id."""
+    return hashlib.sha256(f"{salt or DEFAULT_SALT}:{sid}".encode()).hexdigest()[:12]
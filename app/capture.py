@@ -0,0 +1,156 @@
+"""
+Traffic Capture for Replay
+
+Optionally records real /chat requests so they can be replayed against other
+models or backends (see agents/replay.py). Only what is needed to rebuild the
+prompt is kept: the message, the conversation context and the hint level.
+Session ids are replaced by the same salted hash analytics uses
+(app/anonymize.py), and e-mail addresses and phone numbers are masked before
+anything is written.
+
+Records are gzip-compressed JSON Lines; each batch is appended as its own gzip
+member, which ``gzip.open`` reads back as one stream. Writes happen on a
+background thread, as in app/analytics.py.
+
+Configured through environment variables:
+- CAPTURE_ENABLED       record /chat requests (default 0)
+- CAPTURE_PATH          capture file (default captures/chat.jsonl.gz)
+- CAPTURE_SAMPLE_RATE   fraction of requests captured (default 1)
+"""
+
+import os
+import re
+import gzip
+import json
+import time
+import queue
+import atexit
+import random
+import threading
+from pathlib import Path
+
+from app.anonymize import student_pseudonym
+
+EMAIL = re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+")
+PHONE = re.compile(r"\+?\(?\b\d{3}\)?[\s.-]?\d{3}[\s.-]?\d{4}\b")
+
+# Compact on-disk keys -> readable field names
+FIELDS = {
+    "t": "timestamp",
+    "u": "user",
+    "x": "kind",
+    "m": "message",
+    "c": "context",
+    "h": "hint_level",
+}
+
+
+def anonymise(text: str) -> str:
+    """Mask e-mail addresses and phone numbers."""
+    return PHONE.sub("<phone>", EMAIL.sub("<email>", text or ""))
+
+
+def load_capture(path) -> list:
+    """Read a capture file (gzip or plain JSON Lines) into readable records."""
+    path = Path(path)
+    opener = gzip.open if path.suffix == ".gz" else open
+    records = []
+    with opener(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            try:
+                event = json.loads(line)
+            except ValueError:
+                continue  # torn final line after a crash
+            records.append({name: event.get(short) for short, name in FIELDS.items()})
+    return records
+
+
+class TrafficCapture:
+    """Anonymised, sampled capture of chat requests with batched background writes."""
+
+    def __init__(self, path, sample_rate: float = 1.0, salt: str = None,
+                 flush_seconds: float = 2.0, enabled: bool = False):
+        self.path = Path(path)
+        self.sample_rate = sample_rate
+        self.salt = salt
+        self.flush_seconds = flush_seconds
+        self.enabled = enabled
+        self.captured = 0
+        self._queue = queue.Queue()
+        self._writer = None
+
+        if self.enabled:
+            self._writer = threading.Thread(target=self._write_loop, name="capture-writer", daemon=True)
+            self._writer.start()
+            atexit.register(self.flush)
+            print(f"[DEBUG] Capturing /chat traffic to {self.path} (sample rate {self.sample_rate})")
+
+    def record(self, sid: str, message: str, context: str = "", hint_level: int = 0):
+        """
+        Capture one request (cheap: the record is handed to the writer thread).
+
+        Args:
+            sid: Session id (stored only as its pseudonym)
+            message: Student message, or the current problem for a hint request
+            context: Conversation context the prompt was built with
+            hint_level: Hint level requested (0 for a new question)
+        """
+        if not self.enabled or random.random() >= self.sample_rate:
+            return
+        event = {
+            "t": round(time.time(), 1),
+            "u": student_pseudonym(sid, self.salt),
+            "x": "hint" if hint_level else "question",
+            "m": anonymise(message),
+        }
+        if context:
+            event["c"] = anonymise(context)
+        if hint_level:
+            event["h"] = hint_level
+        self.captured += 1
+        self._queue.put(event)
+
+    def flush(self, timeout: float = 5.0):
+        """Block until every captured request is on disk."""
+        if self._writer is None:
+            return
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+
+    def _write_loop(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_seconds
+            while not isinstance(batch[-1], threading.Event):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._append([e for e in batch if not isinstance(e, threading.Event)])
+            for marker in batch:
+                if isinstance(marker, threading.Event):
+                    marker.set()
+
+    def _append(self, batch):
+        if not batch:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with gzip.open(self.path, "at", encoding="utf-8") as f:
+                f.write("".join(json.dumps(e, separators=(",", ":")) + "\n" for e in batch))
+        except OSError as e:
+            print(f"[ERROR] Capture write failed ({len(batch)} requests dropped): {e}")
+
+
+base_dir = Path(__file__).resolve().parent.parent
+
+# Shared capture instance
+traffic_capture = TrafficCapture(
+    os.getenv("CAPTURE_PATH", str(base_dir / "captures" / "chat.jsonl.gz")),
+    sample_rate=float(os.getenv("CAPTURE_SAMPLE_RATE", "1")),
+    enabled=os.getenv("CAPTURE_ENABLED", "0") in ("1", "true", "True"),
+)
@@ -0,0 +1,265 @@
+"""
+Server-Side Conversation History
+
+Chat turns used to live in the signed session cookie (re-serialised on every
+request) and again in the browser's localStorage (rewritten after every
+message), so both sides got slower as a session grew. Turns are now kept here:
+
+- each session's turns are appended to history/<session>.jsonl, one line per turn
+- a bounded LRU of sessions stays in memory for building context and paging
+- turn ids are sequential per session, so a page is a constant-time slice
+
+``page`` serves the newest turns and pages backwards with a ``before`` cursor;
+``since`` returns only turns newer than the client's latest id. Every result
+carries the session ``epoch`` (new whenever the session is cleared or reloaded
+from disk) and ``latest`` id, which together make a cheap ETag.
+
+Retention: sessions idle for longer than the age limit are deleted by a
+cleanup pass at startup and then at most once an hour. A session longer than
+the turn limit is compacted to its newest turns. Compaction renumbers them
+and starts a new epoch, so open clients reload.
+
+Configured through environment variables:
+- HISTORY_DIR             where turns are stored (default history/)
+- HISTORY_CACHE_SESSIONS  sessions kept in memory (default 256)
+- HISTORY_MAX_AGE_DAYS    delete sessions idle this long (default 30, 0 keeps them)
+- HISTORY_MAX_TURNS       turns kept per session (default 1000, 0 keeps all)
+"""
+
+import os
+import re
+import json
+import time
+import uuid
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+
+class HistoryStore:
+    """Append-only per-session turn log with cursor pagination."""
+
+    def __init__(self, directory, max_sessions: int = 256, page_max: int = 100,
+                 max_age_days: float = 0, max_turns: int = 0, purge_interval: float = 3600.0):
+        self.directory = Path(directory)
+        self.max_sessions = max_sessions
+        self.page_max = page_max
+        self.max_age_days = max_age_days
+        self.max_turns = max_turns
+        self.purge_interval = purge_interval
+        self._sessions = OrderedDict()  # sid -> {"epoch": str, "turns": [turn, ...]}
+        self._lock = threading.Lock()
+        self._last_purge = 0.0
+        if self.max_age_days > 0:
+            self.purge()
+
+    def append(self, sid: str, user: str, tutor: str) -> dict:
+        """Add one turn and return it (with its id)."""
+        with self._lock:
+            state = self._load(sid)
+            turn = {"id": len(state["turns"]) + 1, "user": user, "tutor": tutor, "ts": round(time.time(), 3)}
+            state["turns"].append(turn)
+            # One short append per turn, under the lock so lines stay in id order
+            try:
+                self.directory.mkdir(parents=True, exist_ok=True)
+                with open(self._path(sid), "a", encoding="utf-8") as f:
+                    f.write(json.dumps({"i": turn["id"], "u": user, "r": tutor, "t": turn["ts"]},
+                                       separators=(",", ":")) + "\n")
+            except OSError as e:
+                print(f"[ERROR] Could not persist history turn {turn['id']}: {e}")
+            # Compact in batches rather than rewriting the file on every turn
+            if self.max_turns > 0 and len(state["turns"]) > self.max_turns + max(1, self.max_turns // 4):
+                self._compact(sid, state)
+        if self.max_age_days > 0 and time.monotonic() - self._last_purge > self.purge_interval:
+            self.purge()
+        return turn
+
+    def import_turns(self, sid: str, turns: list) -> int:
+        """
+        Seed an empty session with turns kept by older versions (cookie or browser copy).
+
+        Args:
+            sid: Session id
+            turns: ``{"user": ..., "tutor": ...}`` dicts, oldest first
+
+        Returns:
+            Number of turns imported (0 if the session already has history).
+        """
+        with self._lock:
+            state = self._load(sid)
+            if state["turns"]:
+                return 0
+            now = round(time.time(), 3)
+            imported = [{"id": i, "user": str(t.get("user", "")), "tutor": str(t.get("tutor", "")), "ts": now}
+                        for i, t in enumerate(turns, start=1)]
+            if not imported:
+                return 0
+            try:
+                self.directory.mkdir(parents=True, exist_ok=True)
+                with open(self._path(sid), "a", encoding="utf-8") as f:
+                    f.write("".join(json.dumps({"i": t["id"], "u": t["user"], "r": t["tutor"], "t": t["ts"]},
+                                               separators=(",", ":")) + "\n" for t in imported))
+            except OSError as e:
+                print(f"[ERROR] Could not import history for {sid}: {e}")
+                return 0
+            state["turns"] = imported
+            state["epoch"] = uuid.uuid4().hex[:8]
+        return len(imported)
+
+    def recent(self, sid: str, count: int = 4) -> list:
+        """The last ``count`` turns, oldest first (used to build prompt context)."""
+        with self._lock:
+            return self._load(sid)["turns"][-count:]
+
+    def count(self, sid: str) -> int:
+        with self._lock:
+            return len(self._load(sid)["turns"])
+
+    def page(self, sid: str, before: int = None, limit: int = 20) -> dict:
+        """
+        One page of turns, oldest first.
+
+        Args:
+            sid: Session id
+            before: Only turns with a smaller id (the ``before`` cursor of the previous page);
+                None for the newest page
+            limit: Page size (capped at page_max)
+
+        Returns:
+            Dict with ``turns``, ``before`` (cursor for the next older page, or None),
+            ``latest`` id and ``epoch``.
+        """
+        limit = max(1, min(limit, self.page_max))
+        with self._lock:
+            state = self._load(sid)
+            turns = state["turns"]
+            end = len(turns) if before is None else max(0, min(before - 1, len(turns)))
+            start = max(0, end - limit)
+            return {
+                "turns": turns[start:end],
+                "before": start + 1 if start > 0 else None,
+                "latest": len(turns),
+                "epoch": state["epoch"],
+            }
+
+    def since(self, sid: str, after: int, epoch: str = None, limit: int = 20) -> dict:
+        """
+        Turns newer than ``after`` for incremental sync.
+
+        A stale ``epoch`` (history cleared or server restarted since the client
+        loaded) sets ``reset`` and returns the newest page instead.
+        """
+        limit = max(1, min(limit, self.page_max))
+        with self._lock:
+            state = self._load(sid)
+            turns = state["turns"]
+            if epoch != state["epoch"] or after < 0 or after > len(turns):
+                reset = True
+                newer = turns[-limit:]
+            else:
+                reset = False
+                newer = turns[after:after + limit]
+            return {
+                "turns": newer,
+                "reset": reset,
+                "has_more": bool(newer) and newer[-1]["id"] < len(turns),
+                "before": newer[0]["id"] if reset and newer and newer[0]["id"] > 1 else None,
+                "latest": len(turns),
+                "epoch": state["epoch"],
+            }
+
+    def clear(self, sid: str):
+        """Forget a session's turns; clients holding the old epoch will reset."""
+        with self._lock:
+            self._sessions.pop(sid, None)
+            try:
+                self._path(sid).unlink(missing_ok=True)
+            except OSError as e:
+                print(f"[ERROR] Could not delete history for {sid}: {e}")
+
+    def purge(self) -> int:
+        """
+        Delete sessions with no new turn within the age limit.
+
+        Returns:
+            Number of sessions deleted.
+        """
+        self._last_purge = time.monotonic()
+        if self.max_age_days <= 0 or not self.directory.is_dir():
+            return 0
+        cutoff = time.time() - self.max_age_days * 86400
+        removed = 0
+        with self._lock:
+            for path in self.directory.glob("*.jsonl"):
+                try:
+                    if path.stat().st_mtime >= cutoff:
+                        continue
+                    path.unlink()
+                    removed += 1
+                except OSError as e:
+                    print(f"[ERROR] Could not delete expired history {path.name}: {e}")
+            # Cached sessions whose file just went are forgotten too
+            for sid, state in list(self._sessions.items()):
+                if state["turns"] and state["turns"][-1]["ts"] < cutoff:
+                    del self._sessions[sid]
+        if removed:
+            print(f"[DEBUG] Deleted {removed} history sessions idle for over {self.max_age_days} days")
+        return removed
+
+    def _compact(self, sid: str, state: dict):
+        """Keep only the newest ``max_turns`` turns, renumbered from 1 (caller holds the lock)."""
+        kept = state["turns"][-self.max_turns:]
+        turns = [{**turn, "id": i} for i, turn in enumerate(kept, start=1)]
+        path = self._path(sid)
+        tmp = path.with_suffix(".tmp")
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write("".join(json.dumps({"i": t["id"], "u": t["user"], "r": t["tutor"], "t": t["ts"]},
+                                           separators=(",", ":")) + "\n" for t in turns))
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"[ERROR] Could not compact history for {sid}: {e}")
+            return
+        # Ids changed, so clients must reload from the newest page
+        state["turns"] = turns
+        state["epoch"] = uuid.uuid4().hex[:8]
+
+    def _path(self, sid: str) -> Path:
+        # Session ids are uuid hex; anything else is hashed so it is a safe file name
+        name = sid if re.fullmatch(r"[0-9a-f]{8,64}", sid) else hashlib.sha256(sid.encode()).hexdigest()
+        return self.directory / f"{name}.jsonl"
+
+    def _load(self, sid: str) -> dict:
+        """Session state from the cache, read from disk on a miss (caller holds the lock)."""
+        state = self._sessions.get(sid)
+        if state is not None:
+            self._sessions.move_to_end(sid)
+            return state
+
+        turns = []
+        path = self._path(sid)
+        if path.exists():
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        continue  # torn final line after a crash
+                    turns.append({"id": len(turns) + 1, "user": event["u"], "tutor": event["r"], "ts": event["t"]})
+        state = {"epoch": uuid.uuid4().hex[:8], "turns": turns}
+        self._sessions[sid] = state
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+        return state
+
+
+base_dir = Path(__file__).resolve().parent.parent
+
+# Shared history store instance
+history_store = HistoryStore(
+    os.getenv("HISTORY_DIR", str(base_dir / "history")),
+    max_sessions=int(os.getenv("HISTORY_CACHE_SESSIONS", "256")),
+    max_age_days=float(os.getenv("HISTORY_MAX_AGE_DAYS", "30")),
+    max_turns=int(os.getenv("HISTORY_MAX_TURNS", "1000")),
+)
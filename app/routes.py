@@ -3,54 +3,249 @@ Flask Routes for DSA Tutor
 Uses Groq-based tutor agent with Google ADK framework structure.
 """
 
-from flask import Blueprint, render_template, request, session, jsonify
+from flask import Blueprint, render_template, request, session, jsonify, g, send_from_directory
 from agents.tutor_agent import tutor_agent
+from agents.prefetch import prefetcher
+from agents.staged import staged_workflow
+from agents.transport import shared_transport
+from agents.deadline import RequestCancelled, deadline_registry, deadline_stats
+from agents.dsa_tools import detect_concept, detect_problem
+from agents.profiling import profiler, profiled, profile_section
+from agents.tool_layer import tool_stats
+from agents.similar_problems import problem_index, PRACTICE_SUGGESTIONS
+from app.analytics import analytics
+from app.capture import traffic_capture
+from app.history import history_store
+from app.anonymize import student_pseudonym
+import hmac
 import json
+import os
+import re
+import time
+import uuid
 
 main_routes = Blueprint("main_routes", __name__)
 
+# Messages that ask to climb the hint ladder for the current problem
+HINT_REQUEST = re.compile(r"\b(hint|hints|stuck|clue)\b", re.IGNORECASE)
+
+# A hint request naming no problem must be this short; longer ones are new questions
+HINT_MAX_WORDS = 12
+
+# Most turns imported from an older version's browser copy of the chat
+HISTORY_IMPORT_MAX = 500
+
+# Also prefetch hint 1 after a new question; off by default, since most questions
+# never need a hint and it would double the upstream calls per question
+PREFETCH_FIRST_HINT = os.getenv("PREFETCH_FIRST_HINT", "0") in ("1", "true", "True")
+
+# Generate the workflow in stages by default (clients may override per request)
+STAGED_DEFAULT = os.getenv("TUTOR_STAGED", "0") in ("1", "true", "True")
+
+# Token for instructor/admin endpoints; without it they are disabled
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+# Endpoints that can be profiled (X-Profile: 1 from an admin, or PROFILE_SAMPLE_RATE)
+PROFILED_ENDPOINTS = {"main_routes.chat", "main_routes.continue_chat"}
+
+
+def _session_id() -> str:
+    """Stable per-browser id used to key server-side state."""
+    if "sid" not in session:
+        session["sid"] = uuid.uuid4().hex
+    if "chat_history" in session:
+        # Older versions kept every turn in the cookie: move them to the server-side store
+        history_store.import_turns(session["sid"], session.pop("chat_history") or [])
+    return session["sid"]
+
+
+@profiled("context.build")
+def _build_context(chat_history) -> str:
+    """Build context from chat history (keep last 4 messages for context)."""
+    context = ""
+    if chat_history and len(chat_history) > 0:
+        context = "\n\n--- PREVIOUS CONVERSATION CONTEXT ---\n"
+        for msg in chat_history[-4:]:
+            context += f"Student: {msg['user'][:150]}...\n"
+            context += f"Tutor: {msg['tutor'][:200]}...\n\n"
+        context += "--- END CONTEXT ---\n"
+    return context
+
+
+def _wants_hint(data: dict, user_message: str, problem: str) -> bool:
+    """
+    Decide whether a message asks for the next hint on the current problem.
+
+    The client can say so explicitly with ``"hint": true/false``. Otherwise the
+    message must mention a hint, and either name the current problem or be a
+    short follow-up naming no problem at all ("I'm stuck, hint please").
+    """
+    if not problem:
+        return False
+    if "hint" in data:
+        return bool(data["hint"])
+    if not HINT_REQUEST.search(user_message):
+        return False
+    named = detect_problem(user_message)
+    if named:
+        return named == detect_problem(problem)
+    return len(user_message.split()) <= HINT_MAX_WORDS
+
+
+def _prefetch_hint(sid: str, problem: str, hint_level: int, context: str):
+    """Generate the next hint in the background while the student reads."""
+    if hint_level > 3 or not tutor_agent.available:
+        return  # nothing left to prefetch, or the job could only fail
+    if hint_level == 1 and not PREFETCH_FIRST_HINT:
+        return  # only a student already taking hints is likely to want the next one
+    prompt = tutor_agent.hint_prompt(problem, hint_level, context)
+    prefetcher.schedule((sid, problem, hint_level), tutor_agent.complete, prompt, max_tokens=512,
+                        deadline=prefetcher.job_deadline())
+
+
+def _with_practice(response: str, problem: str, meta: dict) -> str:
+    """Append similar problems from the catalog to a complete workflow answer."""
+    if meta.get("fallback"):
+        return response  # an error or canned reply, not an answer to build on
+    with profile_section("practice.lookup"):
+        return response + problem_index.practice_section(problem or "", PRACTICE_SUGGESTIONS)
+
+
+def _is_admin() -> bool:
+    """Check the X-Admin-Token header; nobody is admin when ADMIN_TOKEN is unset."""
+    if not ADMIN_TOKEN:
+        # Behind a reverse proxy every client looks like localhost, so never trust the address
+        return False
+    return hmac.compare_digest(request.headers.get("X-Admin-Token", ""), ADMIN_TOKEN)
+
+
+def _record_turn(sid: str, kind: str, problem: str, hint_level: int, meta: dict, started: float):
+    """Log one chat turn for instructor analytics (batched, off the request path)."""
+    analytics.record(
+        cohort=session.get("cohort", "default"),
+        student=student_pseudonym(sid),
+        kind=kind,
+        problem=detect_problem(problem or ""),
+        concept=detect_concept(problem or ""),
+        hint_level=hint_level,
+        model=meta.get("model") or ("prefetch" if meta.get("prefetched") else None),
+        latency_ms=int((time.perf_counter() - started) * 1000),
+        prompt_tokens=meta.get("prompt_tokens"),
+        completion_tokens=meta.get("completion_tokens"),
+    )
+
+
+def _cancelled_response(e: RequestCancelled):
+    """504 when the deadline passed, 499 (client closed request) otherwise."""
+    status = 504 if e.reason == "deadline exceeded" else 499
+    return jsonify({
+        "error": f"Request cancelled: {e.reason}",
+        "response": "⏱️ That took too long, so I stopped. Please try again."
+    }), status
+
+
+@main_routes.before_request
+def _start_profile():
+    if request.endpoint not in PROFILED_ENDPOINTS:
+        return
+    forced = request.headers.get("X-Profile") == "1" and _is_admin()
+    if profiler.should_profile(forced):
+        g.profile = profiler.start(f"{request.method} {request.path}")
+
+
+@main_routes.after_request
+def _finish_profile(response):
+    profile = g.pop("profile", None)
+    if profile:
+        response.headers["X-Profile-Id"] = profiler.finish(profile)["id"]
+    return response
+
+
+@main_routes.teardown_request
+def _abandon_profile(error=None):
+    # after_request is skipped on unhandled errors; never leave a sampler running
+    profile = g.pop("profile", None)
+    if profile:
+        profiler.finish(profile)
+
 
 @main_routes.route("/", methods=["GET"])
 def index():
-    return render_template("index.html")
+    return render_template("index.html", staged_default=STAGED_DEFAULT)
 
 
 @main_routes.route("/chat", methods=["POST"])
 def chat():
     try:
-        data = request.get_json()
+        with profile_section("json.parse"):
+            data = request.get_json()
         user_message = data.get("message", "").strip()
         
         if not user_message:
             return jsonify({"error": "Empty message"}), 400
         
-        # Get conversation history from session
-        chat_history = session.get("chat_history", [])
-        
-        # Build context from chat history (keep last 4 messages for context)
-        context = ""
-        if chat_history and len(chat_history) > 0:
-            context = "\n\n--- PREVIOUS CONVERSATION CONTEXT ---\n"
-            for msg in chat_history[-4:]:
-                context += f"Student: {msg['user'][:150]}...\n"
-                context += f"Tutor: {msg['tutor'][:200]}...\n\n"
-            context += "--- END CONTEXT ---\n"
-        
-        # Get response from tutor agent with context
-        response = tutor_agent.handle(user_message, context)
-        
-        # Store in chat history
-        chat_history.append({
-            "user": user_message,
-            "tutor": response
-        })
-        session["chat_history"] = chat_history
-        
-        return jsonify({
+        sid = _session_id()
+        if data.get("cohort"):
+            session["cohort"] = str(data["cohort"])[:64]
+        # One deadline for the whole request; a re-send from the same session supersedes it
+        deadline = deadline_registry.start(sid)
+        started = time.perf_counter()
+        meta = {}
+
+        try:
+            # Only the last few turns are needed for context
+            context = _build_context(history_store.recent(sid, 4))
+
+            problem = session.get("problem")
+            staged = None
+            with prefetcher.foreground():
+                if _wants_hint(data, user_message, problem):
+                    # Next rung of the hint ladder, served from the prefetch store when ready
+                    hint_level = min(session.get("hint_level", 0) + 1, 3)
+                    traffic_capture.record(sid, problem, context, hint_level)
+                    response = prefetcher.get((sid, problem, hint_level), deadline=deadline)
+                    meta["prefetched"] = response is not None
+                    if response is None:
+                        response = tutor_agent.handle_hint(problem, hint_level, context, deadline=deadline, meta=meta)
+                else:
+                    # A new problem/question restarts the hint ladder
+                    problem = user_message
+                    hint_level = 0
+                    traffic_capture.record(sid, user_message, context)
+                    if data.get("staged", STAGED_DEFAULT):
+                        # Only the first steps now; the rest via /continue
+                        staged = staged_workflow.start(sid, user_message, context, deadline=deadline, meta=meta)
+                        response = staged["response"]
+                        if staged["continuation"] is None:
+                            response = _with_practice(response, problem, meta)
+                    else:
+                        # Get response from tutor agent with context
+                        response = tutor_agent.handle(user_message, context, deadline=deadline, meta=meta)
+                        response = _with_practice(response, problem, meta)
+        except RequestCancelled as e:
+            return _cancelled_response(e)
+        finally:
+            deadline_registry.finish(sid, deadline)
+
+        # Store in chat history (server-side, one appended line per turn)
+        turn = history_store.append(sid, user_message, response)
+        session["problem"] = problem
+        session["hint_level"] = hint_level
+
+        _record_turn(sid, "hint" if hint_level else "question", problem, hint_level, meta, started)
+        _prefetch_hint(sid, problem, hint_level + 1, _build_context(history_store.recent(sid, 4)))
+
+        result = {
             "response": response,
-            "history_length": len(chat_history),
+            "turn_id": turn["id"],
+            "history_length": turn["id"],
             "backend": "Groq/Llama"
-        })
+        }
+        if staged:
+            result["continuation"] = staged["continuation"]
+            result["remaining_steps"] = staged["remaining_steps"]
+        with profile_section("json.render"):
+            return jsonify(result)
     
     except Exception as e:
         print(f"[ERROR] Chat endpoint error: {str(e)}")
@@ -60,21 +255,190 @@ def chat():
         }), 500
 
 
+@main_routes.route("/continue", methods=["POST"])
+def continue_chat():
+    """Generate the next stage of a staged response from its continuation handle."""
+    try:
+        data = request.get_json() or {}
+        handle = data.get("continuation", "")
+        if not handle:
+            return jsonify({"error": "Missing continuation"}), 400
+
+        sid = _session_id()
+        deadline = deadline_registry.start(sid)
+        started = time.perf_counter()
+        meta = {}
+        try:
+            with prefetcher.foreground():
+                staged = staged_workflow.resume(sid, handle, deadline=deadline, meta=meta)
+        except RequestCancelled as e:
+            return _cancelled_response(e)
+        finally:
+            deadline_registry.finish(sid, deadline)
+        if staged is None:
+            return jsonify({"error": "Unknown or expired continuation"}), 404
+        if staged["continuation"] is None:
+            # Last stage: practice suggestions come from the catalog, not the model
+            staged["response"] = _with_practice(staged["response"], session.get("problem"), meta)
+
+        turn = history_store.append(sid, "(continue)", staged["response"])
+        _record_turn(sid, "continue", session.get("problem"), 0, meta, started)
+
+        return jsonify({
+            "response": staged["response"],
+            "continuation": staged["continuation"],
+            "remaining_steps": staged["remaining_steps"],
+            "turn_id": turn["id"],
+            "history_length": turn["id"],
+            "backend": "Groq/Llama"
+        })
+
+    except Exception as e:
+        print(f"[ERROR] Continue endpoint error: {str(e)}")
+        return jsonify({
+            "error": f"Server error: {str(e)}",
+            "response": "❌ Sorry, I encountered a server error. Please try again or refresh the page."
+        }), 500
+
+
+@main_routes.route("/cancel", methods=["POST"])
+def cancel_chat():
+    """Stop generating for this session (sent by the page when the tab closes)."""
+    cancelled = "sid" in session and deadline_registry.cancel(session["sid"])
+    return jsonify({"status": "cancelled" if cancelled else "idle"})
+
+
 @main_routes.route("/clear", methods=["POST"])
 def clear_chat():
     try:
         session.pop("chat_history", None)
+        session.pop("problem", None)
+        session.pop("hint_level", None)
+        if "sid" in session:
+            deadline_registry.cancel(session["sid"])
+            prefetcher.invalidate(session["sid"])
+            staged_workflow.discard(session["sid"])
+            history_store.clear(session["sid"])
         return jsonify({"status": "cleared"})
     except Exception as e:
         print(f"[ERROR] Clear endpoint error: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
 
+@main_routes.route("/history", methods=["GET"])
+def history():
+    """
+    Conversation turns for the web client, oldest first within a page.
+
+    Query args:
+        limit: Page size (default 20)
+        before: Cursor from a previous page; returns the next older page
+        since, epoch: Latest turn id and epoch the client has; returns only newer turns
+            (``reset`` is set when the epoch is stale and the client should reload)
+    """
+    sid = _session_id()
+    limit = request.args.get("limit", 20, type=int)
+    since = request.args.get("since", type=int)
+    if since is not None and since < 0:
+        return jsonify({"error": "Invalid since"}), 400
+    if since is not None:
+        result = history_store.since(sid, since, request.args.get("epoch"), limit)
+    else:
+        result = history_store.page(sid, request.args.get("before", type=int), limit)
+
+    response = jsonify(result)
+    # Same URL + same epoch/latest -> same body, so revalidation is a cheap 304
+    response.headers["Cache-Control"] = "private, no-cache"
+    response.set_etag(f"{result['epoch']}.{result['latest']}")
+    return response.make_conditional(request)
+
+
+@main_routes.route("/history/import", methods=["POST"])
+def import_history():
+    """
+    Import the browser copy of the chat kept by older versions (localStorage).
+
+    Only seeds a session with no server-side history, so re-sending it is harmless.
+    """
+    data = request.get_json() or {}
+    turns = data.get("turns")
+    if not isinstance(turns, list) or not all(isinstance(t, dict) for t in turns):
+        return jsonify({"error": "Expected a list of turns"}), 400
+    imported = history_store.import_turns(_session_id(), turns[-HISTORY_IMPORT_MAX:])
+    return jsonify({"imported": imported})
+
+
 @main_routes.route("/status", methods=["GET"])
 def status():
     """Check backend status."""
     return jsonify({
         "backend": "Groq/Llama",
         "framework": "Google ADK (structure)",
-        "status": "ok"
+        "status": "ok",
+        "prefetch": prefetcher.stats(),
+        "transport": shared_transport.stats(),
+        "cancellation": deadline_stats.snapshot(),
+        "tools": tool_stats(),
+        "recommendations": problem_index.stats()
+    })
+
+
+@main_routes.route("/analytics", methods=["GET"])
+def analytics_overview():
+    """Cohorts with recorded activity plus per-model latency and token usage."""
+    if not _is_admin():
+        return jsonify({"error": "Forbidden"}), 403
+    return jsonify({
+        "cohorts": analytics.cohorts(),
+        "models": analytics.models(),
+        "events": analytics.aggregates.total_events
     })
+
+
+@main_routes.route("/analytics/cohorts/<cohort>", methods=["GET"])
+def analytics_cohort(cohort):
+    """Top problems/concepts and hint-escalation rates for one cohort."""
+    if not _is_admin():
+        return jsonify({"error": "Forbidden"}), 403
+    summary = analytics.summary(cohort, top=request.args.get("top", 10, type=int))
+    if summary is None:
+        return jsonify({"error": "Unknown cohort"}), 404
+    return jsonify(summary)
+
+
+@main_routes.route("/analytics/cohorts/<cohort>/students", methods=["GET"])
+def analytics_cohort_students(cohort):
+    """Pseudonyms of a cohort's students with turns, hints and problems attempted."""
+    if not _is_admin():
+        return jsonify({"error": "Forbidden"}), 403
+    students = analytics.students(cohort)
+    if students is None:
+        return jsonify({"error": "Unknown cohort"}), 404
+    return jsonify({"cohort": cohort, "students": students})
+
+
+@main_routes.route("/analytics/students/<student>", methods=["GET"])
+def analytics_student(student):
+    """Progress of one student, addressed by pseudonym (see app/anonymize.py)."""
+    if not _is_admin():
+        return jsonify({"error": "Forbidden"}), 403
+    progress = analytics.student(student)
+    if progress is None:
+        return jsonify({"error": "Unknown student"}), 404
+    return jsonify(progress)
+
+
+@main_routes.route("/admin/profiles", methods=["GET"])
+def list_profiles():
+    """Summaries of the most recent request profiles."""
+    if not _is_admin():
+        return jsonify({"error": "Forbidden"}), 403
+    return jsonify({"profiles": profiler.recent(request.args.get("limit", 20, type=int))})
+
+
+@main_routes.route("/admin/profiles/<path:filename>", methods=["GET"])
+def download_profile(filename):
+    """Download a collapsed-stack (.folded) or cProfile (.prof) file."""
+    if not _is_admin():
+        return jsonify({"error": "Forbidden"}), 403
+    return send_from_directory(profiler.directory, filename, as_attachment=True)
@@ -0,0 +1,76 @@
+"""Learning-analytics event log and its incremental aggregates."""
+
+import json
+import time
+
+from app.analytics import AnalyticsLog
+
+
+def _turn(log, student, problem, hint_level=0, cohort="cs101", **extra):
+    log.record(cohort=cohort, student=student, problem=problem, hint_level=hint_level, **extra)
+
+
+def test_aggregates_update_on_record(tmp_path):
+    log = AnalyticsLog(tmp_path / "events.jsonl", flush_seconds=60)
+
+    _turn(log, "s1", "two sum", concept="hash table", model="llama-3.1-8b-instant",
+          latency_ms=120, completion_tokens=300)
+    _turn(log, "s1", "two sum", hint_level=1)
+    _turn(log, "s1", "two sum", hint_level=2)
+    _turn(log, "s2", "two sum", hint_level=1)
+    _turn(log, "s2", "valid parentheses")
+
+    summary = log.summary("cs101")
+    assert summary["turns"] == 5
+    assert summary["students"] == 2
+    assert summary["top_problems"][0] == ("two sum", 4)
+    assert summary["top_concepts"] == [("hash table", 1)]
+    assert summary["hint_escalation"] == {"1_to_2": 0.5, "2_to_3": 0.0}
+
+    progress = log.student("s1")
+    assert progress["problems"] == {"two sum": 2}
+    assert progress["hints"] == 2
+    assert log.student("s2")["problems_without_hints"] == 1
+
+    assert log.models()["llama-3.1-8b-instant"]["avg_completion_tokens"] == 300
+    assert log.summary("unknown") is None
+
+
+def test_log_is_compact_and_replayed_on_startup(tmp_path):
+    path = tmp_path / "events.jsonl"
+    log = AnalyticsLog(path, flush_seconds=60)
+    _turn(log, "s1", "binary search", hint_level=1)
+    _turn(log, "s1", "binary search", hint_level=2, cohort="cs102")
+    log.flush()
+
+    lines = path.read_text().splitlines()
+    assert len(lines) == 2
+    first = json.loads(lines[0])
+    assert first["c"] == "cs101" and first["p"] == "binary search" and first["h"] == 1
+    assert ", " not in lines[0] and ": " not in lines[0]
+
+    reloaded = AnalyticsLog(path, flush_seconds=60)
+    assert reloaded.cohorts() == ["cs101", "cs102"]
+    assert reloaded.student("s1")["problems"] == {"binary search": 2}
+
+
+def test_disabled_log_records_nothing(tmp_path):
+    log = AnalyticsLog(tmp_path / "events.jsonl", enabled=False)
+    _turn(log, "s1", "two sum")
+    log.flush()
+    assert log.summary("cs101") is None
+    assert not (tmp_path / "events.jsonl").exists()
+
+
+def test_cohort_lists_its_students(tmp_path):
+    log = AnalyticsLog(tmp_path / "events.jsonl", flush_seconds=60)
+    _turn(log, "s1", "two sum")
+    time.sleep(0.01)  # timestamps are kept to the millisecond
+    _turn(log, "s2", "two sum", hint_level=1)
+    _turn(log, "s3", "valid parentheses", cohort="cs102")
+
+    students = log.students("cs101")
+    assert [s["student"] for s in students] == ["s2", "s1"]  # most recently active first
+    assert students[0] == {"student": "s2", "turns": 1, "hints": 1, "problems_attempted": 1,
+                           "last_seen": students[0]["last_seen"]}
+    assert log.students("unknown") is None
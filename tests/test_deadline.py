@@ -0,0 +1,151 @@
+"""Request deadlines, the per-session registry and aborting a streamed completion."""
+
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from types import SimpleNamespace
+
+import pytest
+
+from agents.deadline import Deadline, DeadlineRegistry, DeadlineStats, RequestCancelled
+from agents.transport import shared_transport
+from agents.tutor_agent import _request_timeout, tutor_agent
+
+# agents/__init__.py re-exports the tutor_agent instance under the module's name
+tutor_module = sys.modules["agents.tutor_agent"]
+
+
+def test_request_timeout_keeps_pool_connect_limit():
+    timeout = _request_timeout(Deadline(30))
+    assert timeout.connect == shared_transport.timeout.connect
+    assert 29 < timeout.read <= 30
+
+    short = _request_timeout(Deadline(0.5))
+    assert short.connect <= 0.5 and short.read <= 0.5
+
+
+def test_deadline_cancel_and_expiry():
+    deadline = Deadline(30)
+    deadline.check()
+    deadline.cancel("client disconnected")
+    deadline.cancel("superseded")  # the first reason wins
+    with pytest.raises(RequestCancelled, match="client disconnected"):
+        deadline.check()
+
+    expired = Deadline(0.01)
+    time.sleep(0.02)
+    assert expired.cancelled
+    with pytest.raises(RequestCancelled, match="deadline exceeded"):
+        expired.check()
+
+
+def test_sleep_wakes_early_on_cancel():
+    deadline = Deadline(30)
+    threading.Timer(0.05, deadline.cancel).start()
+    start = time.monotonic()
+    with pytest.raises(RequestCancelled):
+        deadline.sleep(5)
+    assert time.monotonic() - start < 1
+
+
+def test_wait_returns_result_or_cancels_the_future():
+    done = Future()
+    done.set_result("answer")
+    assert Deadline(5).wait(done) == "answer"
+
+    deadline = Deadline(5)
+    deadline.cancel()
+    pending = Future()
+    with pytest.raises(RequestCancelled):
+        deadline.wait(pending, cancel_on_exit=False)
+    assert not pending.cancelled()
+    with pytest.raises(RequestCancelled):
+        deadline.wait(pending)
+    assert pending.cancelled()
+
+
+def test_registry_supersedes_and_finishes_by_identity():
+    registry = DeadlineRegistry(default_seconds=30)
+    first = registry.start("s1")
+    second = registry.start("s1")
+    assert first.cancelled and first.reason == "superseded"
+    assert not second.cancelled
+
+    registry.finish("s1", first)  # a late finish of the old request keeps the new one
+    assert registry.cancel("s1")
+    assert second.reason == "client disconnected"
+    assert not registry.cancel("s1")
+
+    third = registry.start("s1")
+    registry.finish("s1", third)
+    assert not registry.cancel("s1") and not third.cancelled
+
+
+def test_stats_classify_reasons():
+    stats = DeadlineStats()
+    stats.record("deadline exceeded", unused_budget=100)
+    stats.record("superseded")
+    stats.record("client disconnected", unused_budget=-5, tokens_discarded=7, stream_aborted=True)
+    snapshot = stats.snapshot()
+    assert (snapshot["deadline_exceeded"], snapshot["superseded"], snapshot["client_cancelled"]) == (1, 1, 1)
+    assert snapshot["unused_token_budget"] == 100 and snapshot["tokens_discarded"] == 7
+    assert snapshot["streams_aborted"] == 1
+
+
+class FakeStream:
+    """Yields Groq-style chunks; usage arrives on the last one."""
+
+    def __init__(self, words, on_chunk=None):
+        self.words = words
+        self.on_chunk = on_chunk
+        self.closed = False
+
+    def __iter__(self):
+        for i, word in enumerate(self.words):
+            if self.on_chunk:
+                self.on_chunk(i)
+            last = i == len(self.words) - 1
+            usage = SimpleNamespace(prompt_tokens=10, completion_tokens=len(self.words), total_tokens=10 + len(self.words))
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=word))],
+                                  x_groq=SimpleNamespace(usage=usage) if last else None)
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def fake_groq(monkeypatch):
+    stats = DeadlineStats()
+    monkeypatch.setattr(tutor_module, "deadline_stats", stats)
+
+    def install(stream):
+        create = lambda **kwargs: stream
+        client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+        monkeypatch.setattr(tutor_module, "client", client)
+        return stats
+
+    return install
+
+
+def test_stream_completes_and_reports_usage(fake_groq):
+    stream = FakeStream(["a", "b", "c"])
+    fake_groq(stream)
+    meta = {}
+    text = tutor_agent.complete("prompt", max_tokens=50, deadline=Deadline(5), meta=meta, models=["m"])
+    assert text == "abc" and stream.closed
+    assert meta == {"model": "m", "prompt_tokens": 10, "completion_tokens": 3, "total_tokens": 13}
+
+
+def test_cancel_mid_stream_closes_it(fake_groq):
+    deadline = Deadline(5)
+    stream = FakeStream(["w"] * 10, on_chunk=lambda i: i == 3 and deadline.cancel())
+    stats = fake_groq(stream)
+
+    with pytest.raises(RequestCancelled):
+        tutor_agent.complete("prompt", max_tokens=100, deadline=deadline, models=["m"])
+    assert stream.closed
+    snapshot = stats.snapshot()
+    assert snapshot["streams_aborted"] == 1 and snapshot["client_cancelled"] == 1  # recorded once
+    assert snapshot["tokens_discarded"] == 3
+    assert snapshot["unused_token_budget"] == 97
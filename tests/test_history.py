@@ -0,0 +1,151 @@
+"""Server-side history: cursor pagination, incremental sync and ETags."""
+
+from app.history import HistoryStore
+
+SID = "0123456789abcdef0123456789abcdef"
+
+
+def _store(tmp_path, turns=45):
+    store = HistoryStore(tmp_path)
+    for i in range(1, turns + 1):
+        store.append(SID, f"q{i}", f"a{i}")
+    return store
+
+
+def test_pages_walk_backwards_with_cursor(tmp_path):
+    store = _store(tmp_path)
+
+    newest = store.page(SID, limit=20)
+    assert [t["id"] for t in newest["turns"]] == list(range(26, 46))
+    assert newest["before"] == 26 and newest["latest"] == 45
+
+    older = store.page(SID, before=newest["before"], limit=20)
+    assert [t["id"] for t in older["turns"]] == list(range(6, 26))
+    oldest = store.page(SID, before=older["before"], limit=20)
+    assert [t["id"] for t in oldest["turns"]] == [1, 2, 3, 4, 5]
+    assert oldest["before"] is None
+
+    assert [t["user"] for t in store.recent(SID, 2)] == ["q44", "q45"]
+
+
+def test_since_returns_only_newer_turns_and_resets_on_stale_epoch(tmp_path):
+    store = _store(tmp_path)
+    epoch = store.page(SID)["epoch"]
+
+    assert store.since(SID, 45, epoch)["turns"] == []
+    store.append(SID, "q46", "a46")
+    sync = store.since(SID, 45, epoch)
+    assert [t["id"] for t in sync["turns"]] == [46] and not sync["reset"]
+
+    store.clear(SID)
+    store.append(SID, "fresh", "start")
+    sync = store.since(SID, 46, epoch)
+    assert sync["reset"] and [t["user"] for t in sync["turns"]] == ["fresh"]
+
+
+def test_turns_survive_a_restart(tmp_path):
+    _store(tmp_path, turns=3)
+    reloaded = HistoryStore(tmp_path)
+    assert [t["tutor"] for t in reloaded.page(SID)["turns"]] == ["a1", "a2", "a3"]
+    assert reloaded.append(SID, "q4", "a4")["id"] == 4
+
+
+def test_history_endpoint_etag(tmp_path, monkeypatch):
+    from app.main import create_app
+    from app import routes
+
+    monkeypatch.setattr(routes, "history_store", HistoryStore(tmp_path))
+    client = create_app().test_client()
+    with client.session_transaction() as session:
+        session["sid"] = SID
+    routes.history_store.append(SID, "Two Sum", "Use a hash map")
+
+    first = client.get("/history?limit=10")
+    assert first.status_code == 200
+    assert first.get_json()["turns"][0]["user"] == "Two Sum"
+
+    etag = first.headers["ETag"]
+    assert client.get("/history?limit=10", headers={"If-None-Match": etag}).status_code == 304
+
+    routes.history_store.append(SID, "hint", "Think about complements")
+    changed = client.get("/history?limit=10", headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and changed.headers["ETag"] != etag
+
+
+def test_long_sessions_are_compacted_to_the_newest_turns(tmp_path):
+    store = HistoryStore(tmp_path, max_turns=10)
+    for i in range(1, 13):
+        store.append(SID, f"q{i}", f"a{i}")
+    epoch = store.page(SID)["epoch"]
+
+    store.append(SID, "q13", "a13")  # past the slack: rewrite with the newest 10
+    page = store.page(SID)
+    assert [t["user"] for t in page["turns"]] == [f"q{i}" for i in range(4, 14)]
+    assert [t["id"] for t in page["turns"]] == list(range(1, 11))
+    assert store.since(SID, 12, epoch)["reset"]
+
+    reloaded = HistoryStore(tmp_path, max_turns=10)
+    assert [t["user"] for t in reloaded.recent(SID, 10)] == [t["user"] for t in page["turns"]]
+
+
+def test_idle_sessions_are_purged(tmp_path):
+    import os
+    import time
+
+    _store(tmp_path, turns=2)
+    idle = "fedcba9876543210fedcba9876543210"
+    HistoryStore(tmp_path).append(idle, "old", "question")
+    month_ago = time.time() - 31 * 86400
+    os.utime(tmp_path / f"{idle}.jsonl", (month_ago, month_ago))
+
+    store = HistoryStore(tmp_path, max_age_days=30)  # cleanup pass on startup
+    assert not (tmp_path / f"{idle}.jsonl").exists()
+    assert store.count(idle) == 0 and store.count(SID) == 2
+    assert store.purge() == 0
+
+
+def test_run_py_serves_the_full_app():
+    import run
+
+    client = run.app.test_client()
+    assert client.get("/history").status_code == 200
+    assert client.post("/cancel").status_code == 200
+    assert client.post("/continue", json={"continuation": "nope"}).status_code == 404
+
+
+def test_older_copies_of_the_chat_are_imported(tmp_path, monkeypatch):
+    from app.main import create_app
+    from app import routes
+
+    monkeypatch.setattr(routes, "history_store", HistoryStore(tmp_path))
+    client = create_app().test_client()
+    with client.session_transaction() as session:
+        session["sid"] = SID
+        session["chat_history"] = [{"user": "Two Sum", "tutor": "Use a hash map"}]
+
+    turns = client.get("/history").get_json()["turns"]
+    assert [(t["user"], t["tutor"]) for t in turns] == [("Two Sum", "Use a hash map")]
+    with client.session_transaction() as session:
+        assert "chat_history" not in session
+
+    # The browser copy only seeds an empty session
+    browser_copy = {"turns": [{"user": "old", "tutor": "copy"}]}
+    assert client.post("/history/import", json=browser_copy).get_json() == {"imported": 0}
+    client.post("/clear")
+    assert client.post("/history/import", json=browser_copy).get_json() == {"imported": 1}
+    assert client.post("/history/import", json={"turns": "x"}).status_code == 400
+
+
+def test_negative_since_is_rejected(tmp_path, monkeypatch):
+    from app.main import create_app
+    from app import routes
+
+    store = _store(tmp_path, turns=5)
+    epoch = store.page(SID)["epoch"]
+    assert store.since(SID, -3, epoch)["reset"]
+
+    monkeypatch.setattr(routes, "history_store", store)
+    client = create_app().test_client()
+    with client.session_transaction() as session:
+        session["sid"] = SID
+    assert client.get(f"/history?since=-3&epoch={epoch}").status_code == 400
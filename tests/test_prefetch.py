@@ -0,0 +1,136 @@
+"""Budgeted speculative prefetcher, exercised with stub jobs."""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from agents.deadline import Deadline, RequestCancelled
+from agents.prefetch import Prefetcher
+
+
+def _blocking(release: threading.Event, value="done"):
+    release.wait(5)
+    return value
+
+
+def _settle(prefetcher, attempts=100):
+    """Wait until every scheduled job has finished and released its budget slot."""
+    for _ in range(attempts):
+        if all(future.done() for _, future in prefetcher._entries.values()):
+            time.sleep(0.01)  # done callbacks run right after completion
+            return
+        time.sleep(0.01)
+
+
+def test_hit_is_served_once():
+    prefetcher = Prefetcher()
+    assert prefetcher.schedule(("s", "p", 1), lambda: "hint 1")
+    assert not prefetcher.schedule(("s", "p", 1), lambda: "again")  # already stored
+
+    assert prefetcher.get(("s", "p", 1)) == "hint 1"
+    assert prefetcher.get(("s", "p", 1)) is None
+    assert prefetcher.stats()["hits"] == 1 and prefetcher.stats()["misses"] == 1
+
+
+def test_budget_limits_inflight_jobs():
+    prefetcher = Prefetcher(max_inflight=1)
+    release = threading.Event()
+    assert prefetcher.schedule(("s", "a"), _blocking, release)
+    assert not prefetcher.schedule(("s", "b"), _blocking, release)
+    assert prefetcher.stats()["skipped_budget"] == 1
+
+    release.set()
+    _settle(prefetcher)
+    assert prefetcher.schedule(("s", "b"), lambda: "b")
+
+
+def test_backs_off_while_foreground_requests_run():
+    prefetcher = Prefetcher(max_foreground=1)
+    with prefetcher.foreground():
+        assert not prefetcher.schedule(("s", "a"), lambda: "a")
+    assert prefetcher.stats()["skipped_busy"] == 1
+    assert prefetcher.stats()["foreground"] == 0
+    assert prefetcher.schedule(("s", "a"), lambda: "a")
+
+
+def test_expired_results_are_not_served():
+    prefetcher = Prefetcher(ttl_seconds=0.05)
+    prefetcher.schedule(("s", "a"), lambda: "stale")
+    time.sleep(0.1)
+    assert prefetcher.get(("s", "a")) is None
+    assert prefetcher.stats()["expired"] == 1
+
+
+def test_eviction_and_invalidation_cancel_queued_jobs():
+    prefetcher = Prefetcher(max_inflight=2, max_entries=2)
+    # One worker, so the second job waits in the executor queue
+    prefetcher._executor = ThreadPoolExecutor(max_workers=1)
+    release = threading.Event()
+    prefetcher.schedule(("s", "running"), _blocking, release)
+    prefetcher.schedule(("s", "queued"), _blocking, release)
+    queued = prefetcher._entries[("s", "queued")][1]
+
+    prefetcher.invalidate("s")
+    assert queued.cancelled()
+    assert prefetcher.stats()["entries"] == 0
+    # The cancelled job gave its budget slot back
+    assert prefetcher.schedule(("s", "next"), lambda: "next")
+
+    release.set()
+    _settle(prefetcher)
+    prefetcher.schedule(("s", "newest"), lambda: "newest")
+    prefetcher.schedule(("t", "x"), lambda: "x")
+    assert ("s", "next") not in prefetcher._entries  # oldest evicted
+    assert prefetcher.stats()["entries"] == 2
+
+
+def test_cancelled_wait_keeps_the_entry_for_a_retry():
+    prefetcher = Prefetcher()
+    release = threading.Event()
+    prefetcher.schedule(("s", "a"), _blocking, release, "hint")
+
+    deadline = Deadline(5)
+    deadline.cancel("superseded")
+    with pytest.raises(RequestCancelled):
+        prefetcher.get(("s", "a"), deadline=deadline)
+
+    release.set()
+    assert prefetcher.get(("s", "a"), deadline=Deadline(5)) == "hint"
+
+
+def test_failed_job_counts_as_failed():
+    prefetcher = Prefetcher()
+
+    def boom():
+        raise RuntimeError("no model")
+
+    prefetcher.schedule(("s", "a"), boom)
+    assert prefetcher.get(("s", "a")) is None
+    assert prefetcher.stats()["failed"] == 1
+
+
+def test_slow_job_is_a_miss_after_wait_seconds():
+    prefetcher = Prefetcher(wait_seconds=0.2)
+    release = threading.Event()
+    prefetcher.schedule(("s", "a"), _blocking, release)
+
+    started = time.monotonic()
+    assert prefetcher.get(("s", "a"), deadline=Deadline(1.5)) is None
+    assert time.monotonic() - started < 1.0  # fell back well before the request deadline
+    assert prefetcher.stats()["misses"] == 1
+    release.set()
+
+
+def test_jobs_get_their_own_deadline():
+    prefetcher = Prefetcher(job_seconds=0.05)
+
+    def generate(deadline):
+        time.sleep(0.1)
+        deadline.check()
+        return "too late"
+
+    prefetcher.schedule(("s", "a"), generate, deadline=prefetcher.job_deadline())
+    assert prefetcher.get(("s", "a")) is None
+    assert prefetcher.stats()["failed"] == 1
@@ -0,0 +1,115 @@
+"""On-demand request profiling: triggers, output files, pruning and admin access."""
+
+import time
+
+import pytest
+
+from agents.profiling import Profiler, profile_section
+from app import routes
+from app.analytics import AnalyticsLog
+from app.history import HistoryStore
+from app.main import create_app
+
+TOKEN = "s3cret"
+
+
+@pytest.fixture
+def profiler(tmp_path):
+    return Profiler(tmp_path / "profiles", interval_ms=1)
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch, profiler):
+    def slow_answer(user_message, context="", deadline=None, meta=None):
+        time.sleep(0.05)  # long enough to collect stack samples
+        return "Use a hash map."
+
+    monkeypatch.setattr(routes, "profiler", profiler)
+    monkeypatch.setattr(routes, "ADMIN_TOKEN", TOKEN)
+    monkeypatch.setattr(routes, "history_store", HistoryStore(tmp_path / "history"))
+    monkeypatch.setattr(routes, "analytics", AnalyticsLog(tmp_path / "events.jsonl", enabled=False))
+    monkeypatch.setattr(routes.prefetcher, "enabled", False)
+    monkeypatch.setattr(routes.tutor_agent, "handle", slow_answer)
+    return create_app().test_client()
+
+
+def _chat(client, **headers):
+    return client.post("/chat", json={"message": "Explain Two Sum"}, headers=headers)
+
+
+def test_admin_header_writes_a_profile(client, profiler):
+    response = _chat(client, **{"X-Profile": "1", "X-Admin-Token": TOKEN})
+    profile_id = response.headers["X-Profile-Id"]
+
+    assert (profiler.directory / f"{profile_id}.folded").read_text().strip()
+    summary = profiler.recent()[0]
+    assert summary["id"] == profile_id and summary["samples"] > 0
+    assert "json.parse" in summary["sections_ms"]
+
+    download = client.get(f"/admin/profiles/{profile_id}.folded", headers={"X-Admin-Token": TOKEN})
+    assert download.status_code == 200 and b"request" in download.data
+
+
+def test_profile_header_needs_admin(client, profiler):
+    response = _chat(client, **{"X-Profile": "1", "X-Admin-Token": "wrong"})
+    assert "X-Profile-Id" not in response.headers
+    assert profiler.recent() == []
+
+
+def test_profile_files_need_admin(client, profiler):
+    profile_id = _chat(client, **{"X-Profile": "1", "X-Admin-Token": TOKEN}).headers["X-Profile-Id"]
+    assert client.get(f"/admin/profiles/{profile_id}.folded").status_code == 403
+    assert client.get("/admin/profiles").status_code == 403
+
+
+def test_sample_rate_picks_requests(client, profiler, monkeypatch):
+    profiler.sample_rate = 0.5
+    monkeypatch.setattr("agents.profiling.random.random", lambda: 0.4)
+    assert "X-Profile-Id" in _chat(client).headers
+    monkeypatch.setattr("agents.profiling.random.random", lambda: 0.6)
+    assert "X-Profile-Id" not in _chat(client).headers
+
+    profiler.sample_rate = 0
+    assert not profiler.should_profile()
+
+
+def test_cprofile_mode_writes_prof_file(profiler):
+    profiler.mode = "cprofile"
+    profile = profiler.start("GET /test")
+    with profile_section("work"):
+        sum(range(1000))
+    summary = profiler.finish(profile)
+    assert summary["file"] == f"{profile.id}.prof"
+    assert (profiler.directory / summary["file"]).stat().st_size > 0
+
+
+def test_concurrent_cprofile_falls_back_to_sampling(profiler):
+    profiler.mode = "cprofile"
+    first = profiler.start("GET /a")
+    second = Profiler(profiler.directory, mode="cprofile").start("GET /b")  # cannot enable a second cProfile
+    assert (first.mode, second.mode) == ("cprofile", "sample")
+    second.stop()
+    profiler.finish(first)
+
+    again = profiler.start("GET /c")  # released by the first profile
+    assert again.mode == "cprofile"
+    profiler.finish(again)
+
+
+def test_short_request_writes_no_empty_stack_file(tmp_path):
+    profiler = Profiler(tmp_path, interval_ms=1000)
+    summary = profiler.finish(profiler.start("GET /fast"))
+    assert summary["samples"] == 0 and summary["file"] is None
+    assert list(tmp_path.glob("*.folded")) == []
+    assert profiler.recent()[0]["id"] == summary["id"]
+
+
+def test_prune_keeps_the_newest_profiles(tmp_path):
+    profiler = Profiler(tmp_path, interval_ms=1, max_files=2)
+    ids = []
+    for _ in range(4):
+        profile = profiler.start("GET /x")
+        time.sleep(0.02)
+        ids.append(profiler.finish(profile)["id"])
+    assert sorted(p.stem for p in tmp_path.glob("*.json")) == sorted(ids[-2:])
+    assert sorted(p.stem for p in tmp_path.glob("*.folded")) == sorted(ids[-2:])
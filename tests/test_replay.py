@@ -0,0 +1,67 @@
+"""Anonymised traffic capture and the offline replay harness."""
+
+import gzip
+
+from app.capture import TrafficCapture, load_capture
+from agents.replay import AdkBackend, StubBackend, compare, make_backend, main
+
+
+def _capture(tmp_path):
+    capture = TrafficCapture(tmp_path / "chat.jsonl.gz", salt="test", flush_seconds=60, enabled=True)
+    capture.record("sid-1", "Two Sum, email me at ana@example.com or 555-123-4567", "")
+    capture.record("sid-1", "Two Sum", "Student: Two Sum...", hint_level=1)
+    capture.record("sid-2", "Reverse a linked list [1, 2, 3, 4, 5]", "")
+    capture.flush()
+    return capture
+
+
+def test_capture_is_anonymised_and_compressed(tmp_path):
+    capture = _capture(tmp_path)
+    raw = gzip.open(capture.path, "rt", encoding="utf-8").read()
+    assert "ana@example.com" not in raw and "555-123-4567" not in raw
+    assert "sid-1" not in raw
+
+    records = load_capture(capture.path)
+    assert len(records) == 3
+    assert records[0]["message"] == "Two Sum, email me at <email> or <phone>"
+    assert records[0]["user"] == records[1]["user"] != records[2]["user"]
+    assert (records[1]["kind"], records[1]["hint_level"], records[1]["context"]) == ("hint", 1, "Student: Two Sum...")
+    assert records[2]["message"].endswith("[1, 2, 3, 4, 5]")
+
+
+def test_disabled_capture_writes_nothing(tmp_path):
+    capture = TrafficCapture(tmp_path / "chat.jsonl.gz")
+    capture.record("sid", "Two Sum")
+    assert not capture.path.exists()
+
+
+def test_replay_against_stubs(tmp_path):
+    records = load_capture(_capture(tmp_path).path) * 4
+    report = compare(records, [StubBackend(5), make_backend("stub:5:0.5")], concurrency=4)
+
+    baseline, flaky = report["stub:5:0"], report["stub:5:0.5"]
+    assert baseline["requests"] == flaky["requests"] == 12
+    assert baseline["errors"] == 0 and "vs_baseline" not in baseline
+    assert 0 < flaky["errors"] < 12
+    assert baseline["latency_ms"]["p50"] <= baseline["latency_ms"]["p99"] <= baseline["latency_ms"]["max"]
+    assert baseline["completion_tokens"] > 0
+    assert flaky["vs_baseline"]["compared"] == 12 - flaky["errors"]
+
+
+def test_cli_writes_json_report(tmp_path):
+    capture = _capture(tmp_path)
+    report = main([str(capture.path), "--backend", "stub:1", "--limit", "2", "--json", str(tmp_path / "r.json")])
+    assert report["stub:1:0"]["requests"] == 2
+    assert (tmp_path / "r.json").exists()
+
+
+def test_adk_backend_reports_token_usage(tmp_path):
+    def fake_adk(message, session_id, deadline=None, meta=None):
+        # Two model calls in one turn (tool call, then the answer)
+        meta.update(prompt_tokens=120 + 180, completion_tokens=20 + 300, model="gemini-2.0-flash")
+        return "answer"
+
+    records = load_capture(_capture(tmp_path).path)
+    report = compare(records, [AdkBackend(run=fake_adk)], concurrency=1)["adk"]
+    assert report["errors"] == 0
+    assert report["prompt_tokens"] == 3 * 300 and report["completion_tokens"] == 3 * 320
@@ -0,0 +1,160 @@
+"""/chat routing between a new problem and the next hint on the current one."""
+
+import sys
+
+import pytest
+
+from app import routes
+from app.analytics import AnalyticsLog
+from app.history import HistoryStore
+from app.main import create_app
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    # Runs without GROQ_API_KEY: hints come from the static toolkit
+    monkeypatch.setattr(routes, "history_store", HistoryStore(tmp_path / "history"))
+    monkeypatch.setattr(routes, "analytics", AnalyticsLog(tmp_path / "events.jsonl", enabled=False))
+    monkeypatch.setattr(routes.prefetcher, "enabled", False)
+    return create_app().test_client()
+
+
+def _chat(client, message, **extra):
+    response = client.post("/chat", json={"message": message, **extra})
+    assert response.status_code == 200
+    with client.session_transaction() as session:
+        return response.get_json()["response"], session["problem"], session["hint_level"]
+
+
+def test_short_follow_up_climbs_the_hint_ladder(client):
+    _chat(client, "Explain Two Sum")
+    response, problem, level = _chat(client, "I'm stuck, can I get a hint?")
+    assert (problem, level) == ("Explain Two Sum", 1)
+    assert response.startswith("Hint 1: Think about what information")
+
+    _, _, level = _chat(client, "still stuck on two sum, another hint please")
+    assert level == 2
+
+
+def test_stuck_on_a_different_problem_starts_over(client):
+    _chat(client, "Explain Two Sum")
+    message = "New problem, I am stuck: Valid Parentheses, given a string s of brackets, is it valid?"
+    _, problem, level = _chat(client, message)
+    assert (problem, level) == (message, 0)
+
+    long_message = ("I am stuck on this one: given an array of intervals, merge all the overlapping "
+                    "intervals and return the ones that do not overlap")
+    _, problem, level = _chat(client, long_message)
+    assert (problem, level) == (long_message, 0)
+
+
+def test_explicit_hint_flag_wins(client):
+    _chat(client, "Valid Parentheses")
+    response, _, level = _chat(client, "next", hint=True)
+    assert level == 1 and "Last-In-First-Out" in response
+
+    _, problem, level = _chat(client, "a hint about heaps in general", hint=False)
+    assert (problem, level) == ("a hint about heaps in general", 0)
+
+
+def test_analytics_and_capture_share_the_student_pseudonym(tmp_path, monkeypatch):
+    from app.anonymize import student_pseudonym
+    from app.capture import TrafficCapture, load_capture
+
+    log = AnalyticsLog(tmp_path / "events.jsonl", enabled=True)
+    capture = TrafficCapture(tmp_path / "chat.jsonl.gz", enabled=True)
+    monkeypatch.setattr(routes, "history_store", HistoryStore(tmp_path / "history"))
+    monkeypatch.setattr(routes, "analytics", log)
+    monkeypatch.setattr(routes, "traffic_capture", capture)
+    monkeypatch.setattr(routes.prefetcher, "enabled", False)
+    client = create_app().test_client()
+
+    _chat(client, "Explain Two Sum")
+    with client.session_transaction() as session:
+        sid = session["sid"]
+    capture.flush()
+
+    student = student_pseudonym(sid)
+    assert log.student(sid) is None and log.student(student) is not None
+    assert [r["user"] for r in load_capture(capture.path)] == [student]
+
+
+def test_no_practice_suggestions_on_a_fallback_reply(client):
+    # No model configured: the reply is the "not available" notice
+    for extra in ({}, {"staged": True}):
+        response, _, _ = _chat(client, "Explain Two Sum", **extra)
+        assert response.startswith("⚠️ AI service not available")
+        assert "leetcode.com/problems" not in response
+
+
+def test_model_answer_gets_practice_suggestions(client, monkeypatch):
+    def answer(user_message, context="", deadline=None, meta=None):
+        meta["model"] = "stub"
+        return "Use a hash map of complements."
+
+    monkeypatch.setattr(routes.tutor_agent, "handle", answer)
+    response, _, _ = _chat(client, "Explain Two Sum")
+    assert "https://leetcode.com/problems/two-sum-ii-input-array-is-sorted/" in response
+
+
+def test_cohort_link_and_instructor_endpoints(tmp_path, monkeypatch):
+    from app.anonymize import student_pseudonym
+
+    log = AnalyticsLog(tmp_path / "events.jsonl", enabled=True)
+    monkeypatch.setattr(routes, "history_store", HistoryStore(tmp_path / "history"))
+    monkeypatch.setattr(routes, "analytics", log)
+    monkeypatch.setattr(routes.prefetcher, "enabled", False)
+    client = create_app().test_client()
+
+    _chat(client, "Explain Two Sum", cohort="cs101")
+    with client.session_transaction() as session:
+        student = student_pseudonym(session["sid"])
+
+    # No ADMIN_TOKEN configured: instructor endpoints are closed, even to localhost
+    monkeypatch.setattr(routes, "ADMIN_TOKEN", None)
+    assert client.get("/analytics/cohorts/cs101/students").status_code == 403
+
+    monkeypatch.setattr(routes, "ADMIN_TOKEN", "t0ken")
+    headers = {"X-Admin-Token": "t0ken"}
+    listed = client.get("/analytics/cohorts/cs101/students", headers=headers).get_json()
+    assert [s["student"] for s in listed["students"]] == [student]
+    assert client.get(f"/analytics/students/{student}", headers=headers).get_json()["cohort"] == "cs101"
+    assert client.get("/analytics", headers={"X-Admin-Token": "nope"}).status_code == 403
+
+
+def test_technique_names_do_not_name_another_problem(client):
+    from agents.dsa_tools import detect_problem
+
+    assert detect_problem("I'm stuck on the binary search part, hint please") is None
+    assert detect_problem("Explain binary search trees") is None
+    assert detect_problem("Binary Search") == "binary search"
+    assert detect_problem("binary-search") == "binary search"
+    assert detect_problem("Validate Binary Search Tree") == "validate binary search tree"
+
+    _chat(client, "Search Insert Position")
+    _, problem, level = _chat(client, "I'm stuck on the binary search part, hint please")
+    assert (problem, level) == ("Search Insert Position", 1)
+
+
+def test_hints_are_prefetched_only_after_the_first_hint(client, monkeypatch):
+    tutor_module = sys.modules["agents.tutor_agent"]
+    scheduled = []
+    monkeypatch.setattr(routes.prefetcher, "enabled", True)
+    monkeypatch.setattr(routes.prefetcher, "schedule", lambda key, *args, **kwargs: scheduled.append(key[2]))
+    monkeypatch.setattr(tutor_module, "client", object())
+    monkeypatch.setattr(routes.tutor_agent, "complete", lambda prompt, **kwargs: "model hint")
+
+    _chat(client, "Explain Two Sum")
+    assert scheduled == []  # a new question: no speculative hint 1
+    _chat(client, "hint please")
+    assert scheduled == [2]
+
+    monkeypatch.setattr(tutor_module, "client", None)
+    _chat(client, "another hint")
+    assert scheduled == [2]  # no model: a prefetch could only fail
+
+
+def test_page_renders_the_staged_default(client, monkeypatch):
+    assert b'id="stagedToggle" >' in client.get("/").data
+    monkeypatch.setattr(routes, "STAGED_DEFAULT", True)
+    assert b'id="stagedToggle" checked>' in client.get("/").data
@@ -0,0 +1,62 @@
+"""Precomputed similar-problem graph and its approximate free-text search."""
+
+import json
+import time
+
+from agents.similar_problems import ProblemIndex, build_graph, catalog_path, graph_path, _catalog_hash
+
+
+def _index():
+    return ProblemIndex(build_graph(json.loads(catalog_path.read_text(encoding="utf-8"))))
+
+
+def test_shipped_graph_matches_catalog():
+    graph = json.loads(graph_path.read_text(encoding="utf-8"))
+    assert graph["catalog_hash"] == _catalog_hash(catalog_path.read_bytes())
+
+
+def test_named_problem_uses_graph_neighbours():
+    index = _index()
+    assert index.match("Can you explain Two Sum II?")["slug"] == "two-sum-ii-input-array-is-sorted"
+    titles = [p["title"] for p in index.similar("help me with number of islands", k=2)]
+    assert titles[0] == "Max Area of Island"
+    assert "Number of Islands" not in titles
+
+
+def test_free_text_search_and_practice_section():
+    index = _index()
+    hits = index.search("longest substring with no repeated characters, sliding window", k=3)
+    assert hits[0][0]["title"] == "Longest Substring Without Repeating Characters"
+    assert index.search("what is love") == []
+
+    section = index.practice_section("Two Sum", k=2)
+    assert "https://leetcode.com/problems/two-sum-ii-input-array-is-sorted/" in section
+    assert index.practice_section("Two Sum", k=0) == ""
+
+
+def test_lookup_is_sub_millisecond():
+    index = _index()
+    queries = ["two sum", "reverse a linked list in place", "bfs on a grid of oranges"] * 200
+    start = time.perf_counter()
+    for query in queries:
+        index.similar(query, k=2)
+    assert (time.perf_counter() - start) / len(queries) < 0.001
+
+
+def test_paraphrased_statement_does_not_recommend_itself():
+    index = _index()
+    statements = {
+        "Longest Substring Without Repeating Characters":
+            "Given a string, find the length of the longest substring with no repeated characters",
+        "Two Sum":
+            "Given an array of integers and a target, return indices of the two numbers that add up to the target",
+        "Number of Islands":
+            "Given an m x n grid of '1's (land) and '0's (water), count how many islands there are",
+    }
+    for title, statement in statements.items():
+        assert index.match(statement) is None
+        titles = [p["title"] for p in index.similar(statement, k=2)]
+        assert len(titles) == 2 and title not in titles
+
+    # Vague questions still get plain search results
+    assert [p["title"] for p in index.similar("what is dynamic programming", k=1)] == ["Maximum Subarray"]
@@ -0,0 +1,126 @@
+"""Staged workflow: continuation handles, failures and prefetched stages."""
+
+import pytest
+
+from agents.deadline import RequestCancelled
+from agents.prefetch import Prefetcher
+from agents.staged import StagedWorkflow
+
+
+class FakeAgent:
+    """Stands in for DSATutorAgent; records which stages were generated live."""
+
+    def __init__(self):
+        self.generated = []
+        self.available = True
+        self.fail = False
+        self.cancel_next = False
+
+    def handle_stage(self, user_message, stage, context="", earlier="", deadline=None, meta=None):
+        if self.cancel_next:
+            self.cancel_next = False
+            raise RequestCancelled("superseded")
+        if self.fail:
+            meta["fallback"] = True
+            return "⚠️ AI service not available. Please try again later."
+        self.generated.append(stage)
+        return f"stage {stage}"
+
+    def stage_prompt(self, user_message, stage, context="", earlier=""):
+        return f"prompt {stage}"
+
+    def complete(self, prompt, max_tokens=2048, **kwargs):
+        return f"prefetched {prompt}"
+
+
+def _workflow(prefetch=False, **kwargs):
+    agent = FakeAgent()
+    return agent, StagedWorkflow(agent, Prefetcher(enabled=prefetch), **kwargs)
+
+
+def test_stages_are_generated_on_demand():
+    agent, workflow = _workflow()
+    first = workflow.start("s1", "Two Sum")
+    assert first["response"] == "stage 0"
+    assert first["remaining_steps"] == ["solution", "practice"]
+
+    second = workflow.resume("s1", first["continuation"])
+    assert second["remaining_steps"] == ["practice"]
+    last = workflow.resume("s1", second["continuation"])
+    assert last["continuation"] is None and last["remaining_steps"] == []
+    assert agent.generated == [0, 1, 2]
+
+    # A handle is single use
+    assert workflow.resume("s1", first["continuation"]) is None
+
+
+def test_failed_first_stage_creates_no_continuation():
+    agent, workflow = _workflow(prefetch=True)
+    agent.fail = True
+    meta = {}
+    result = workflow.start("s1", "Two Sum", meta=meta)
+    assert result["continuation"] is None and meta["fallback"]
+    assert workflow._pending == {}
+    assert workflow.prefetcher.stats()["scheduled"] == 0
+
+
+def test_failed_stage_keeps_handle_for_retry():
+    agent, workflow = _workflow()
+    handle = workflow.start("s1", "Two Sum")["continuation"]
+
+    agent.cancel_next = True
+    with pytest.raises(RequestCancelled):
+        workflow.resume("s1", handle)
+
+    agent.fail = True
+    failed = workflow.resume("s1", handle)
+    assert failed["continuation"] == handle and failed["remaining_steps"] == ["solution", "practice"]
+
+    agent.fail = False
+    assert workflow.resume("s1", handle)["response"] == "stage 1"
+
+
+def test_handles_are_per_session_and_expire():
+    _, workflow = _workflow(ttl_seconds=0)
+    handle = workflow.start("s1", "Two Sum")["continuation"]
+    assert workflow.resume("s2", handle) is None
+    assert handle in workflow._pending  # another session cannot consume it
+    assert workflow.resume("s1", handle) is None  # expired
+
+
+def test_prefetched_stage_is_used():
+    agent, workflow = _workflow(prefetch=True)
+    handle = workflow.start("s1", "Two Sum")["continuation"]
+    assert workflow.resume("s1", handle)["response"] == "prefetched prompt 1"
+    assert agent.generated == [0]
+
+
+def test_discard_forgets_session_handles():
+    _, workflow = _workflow()
+    workflow.start("s1", "Two Sum")
+    workflow.start("s2", "Valid Parentheses")
+    workflow.discard("s1")
+    assert [state["sid"] for state in workflow._pending.values()] == ["s2"]
+
+
+def test_next_stage_is_prefetched_only_with_spare_capacity():
+    _, workflow = _workflow(prefetch=True)
+    with workflow.prefetcher.foreground(), workflow.prefetcher.foreground():
+        workflow.start("s1", "Two Sum")  # another request is running
+    assert workflow.prefetcher.stats()["scheduled"] == 0
+
+    with workflow.prefetcher.foreground():
+        workflow.start("s1", "Two Sum")  # only this request
+    assert workflow.prefetcher.stats()["scheduled"] == 1
+
+    workflow.prefetch = "off"
+    workflow.start("s1", "Two Sum")
+    assert workflow.prefetcher.stats()["scheduled"] == 1
+
+
+def test_no_stage_prefetch_without_a_model():
+    agent, workflow = _workflow(prefetch=True)
+    workflow.prefetch = "always"
+    agent.available = False
+    workflow.start("s1", "Two Sum")
+    assert workflow.prefetcher.stats()["scheduled"] == 0
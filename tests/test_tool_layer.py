@@ -0,0 +1,131 @@
+"""Async tool layer: memoization, in-flight sharing, cancellation and metrics."""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from agents import tool_layer
+from agents.tool_layer import ToolCache, ToolMetrics, async_tool
+
+
+@pytest.fixture(autouse=True)
+def fresh_state(monkeypatch):
+    monkeypatch.setattr(tool_layer, "tool_cache", ToolCache(max_entries=2, ttl_seconds=600))
+    monkeypatch.setattr(tool_layer, "tool_metrics", ToolMetrics())
+    monkeypatch.setattr(tool_layer, "_in_flight", {})
+
+
+def _counting_tool(calls, delay=0.0):
+    @async_tool
+    async def lookup(name: str, detail: bool = False):
+        """Look something up."""
+        calls.append(name)
+        await asyncio.sleep(delay)
+        return f"{name}:{detail}"
+    return lookup
+
+
+def test_results_are_memoized_by_arguments():
+    calls = []
+    lookup = _counting_tool(calls)
+
+    async def run():
+        assert await lookup("heap") == "heap:False"
+        assert await lookup(name="heap", detail=False) == "heap:False"  # same bound arguments
+        assert await lookup("heap", detail=True) == "heap:True"
+
+    asyncio.run(run())
+    assert calls == ["heap", "heap"]
+    assert lookup.__name__ == "lookup" and lookup.__doc__ == "Look something up."
+    assert tool_layer.tool_stats()["tools"]["lookup"]["cache_hits"] == 1
+
+
+def test_cache_expires_and_evicts_least_recently_used():
+    cache = ToolCache(max_entries=2, ttl_seconds=0.05)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == (True, 1)  # "a" is now the most recent
+    cache.put("c", 3)
+    assert cache.get("b") == (False, None) and cache.evictions == 1
+
+    time.sleep(0.1)
+    assert cache.get("a") == (False, None)
+
+
+def test_identical_calls_in_flight_share_one_execution():
+    calls = []
+    lookup = _counting_tool(calls, delay=0.05)
+
+    async def run():
+        return await asyncio.gather(lookup("graph"), lookup("graph"), lookup("tree"))
+
+    assert asyncio.run(run()) == ["graph:False", "graph:False", "tree:False"]
+    assert sorted(calls) == ["graph", "tree"]
+    stats = tool_layer.tool_stats()["tools"]["lookup"]
+    assert stats["calls"] == 3 and stats["shared_in_flight"] == 1
+    assert tool_layer._in_flight == {}
+
+
+def test_cancelled_caller_does_not_cancel_the_shared_call():
+    calls = []
+    lookup = _counting_tool(calls, delay=0.05)
+
+    async def run():
+        leader = asyncio.create_task(lookup("dp"))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(lookup("dp"))
+        await asyncio.sleep(0)
+        leader.cancel()
+        result = await follower
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return result
+
+    assert asyncio.run(run()) == "dp:False"
+    assert calls == ["dp"]
+    assert tool_layer.tool_cache.get(("lookup", '{"detail": false, "name": "dp"}')) == (True, "dp:False")
+    stats = tool_layer.tool_stats()["tools"]["lookup"]
+    assert stats["cancelled"] == 1 and stats["shared_in_flight"] == 1
+
+
+def test_sync_tools_run_off_the_event_loop():
+    loop_thread = []
+
+    @async_tool(memoize=False)
+    def blocking(x: int):
+        loop_thread.append(threading.current_thread())
+        time.sleep(0.05)
+        return x * 2
+
+    async def run():
+        started = time.perf_counter()
+        results = await asyncio.gather(blocking(1), blocking(2), blocking(3))
+        return results, time.perf_counter() - started
+
+    results, elapsed = asyncio.run(run())
+    assert results == [2, 4, 6]
+    assert threading.main_thread() not in loop_thread
+    assert elapsed < 0.15  # overlapped, not run one after another
+    assert tool_layer.tool_stats()["tools"]["blocking"]["calls"] == 3
+
+
+def test_failures_are_counted_and_not_cached():
+    attempts = []
+
+    @async_tool
+    def flaky(x: int):
+        attempts.append(x)
+        if len(attempts) == 1:
+            raise ValueError("engine unavailable")
+        return x
+
+    async def run():
+        with pytest.raises(ValueError):
+            await flaky(1)
+        return await flaky(1)
+
+    assert asyncio.run(run()) == 1
+    stats = tool_layer.tool_stats()["tools"]["flaky"]
+    assert stats["errors"] == 1 and stats["calls"] == 2 and stats["cache_hits"] == 0
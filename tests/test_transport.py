@@ -0,0 +1,96 @@
+"""Shared HTTP transport against a local keep-alive HTTP stub."""
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+
+from agents.transport import SharedTransport
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def do_GET(self):
+        if self.path == "/slow":
+            time.sleep(0.5)
+        body = b'{"ok": true}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_sync_client_reuses_keepalive_connection(stub_url):
+    transport = SharedTransport(max_connections=4, max_keepalive=4)
+    client = transport.sync_client
+    assert transport.sync_client is client
+
+    for _ in range(5):
+        assert client.get(f"{stub_url}/ok").json() == {"ok": True}
+
+    stats = transport.stats()
+    assert stats["sync"]["requests_total"] == 5
+    assert stats["sync"]["requests_active"] == 0
+    assert stats["sync"]["connections_opened"] == 1
+    assert stats["sync"]["pool"] == {"open": 1, "idle": 1, "busy": 0}
+    transport.close()
+
+
+def test_concurrent_requests_are_bounded_by_pool_size(stub_url):
+    transport = SharedTransport(max_connections=2, max_keepalive=2)
+    client = transport.sync_client
+    threads = [threading.Thread(target=client.get, args=(f"{stub_url}/ok",)) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    stats = transport.stats()["sync"]
+    assert stats["requests_total"] == 8
+    assert stats["connections_opened"] <= 2
+    transport.close()
+
+
+def test_read_timeout_is_enforced(stub_url):
+    transport = SharedTransport(connect_timeout=1.0, read_timeout=0.1)
+    with pytest.raises(httpx.ReadTimeout):
+        transport.sync_client.get(f"{stub_url}/slow")
+
+    assert transport.stats()["sync"]["requests_failed"] == 1
+    transport.close()
+
+
+def test_async_client_counts_requests(stub_url):
+    import asyncio
+
+    transport = SharedTransport()
+
+    async def fetch():
+        client = transport.async_client
+        try:
+            await asyncio.gather(*(client.get(f"{stub_url}/ok") for _ in range(3)))
+        finally:
+            await transport.aclose()
+        return client
+
+    client = asyncio.run(fetch())
+    assert transport.stats()["async"]["requests_total"] == 3
+    assert client.is_closed
+    assert transport.stats()["async"]["pool"]["open"] == 0